@@ -0,0 +1,154 @@
+from array import array
+from typing import Any, Tuple
+
+from cluster.encoded_corpus import CODE_FORMAT, ID_FORMAT, OFFSET_FORMAT, EncodedCorpus
+
+
+def _is_list_column(data: Any) -> bool:
+    """
+    This function checks if the data is a pyarrow array or a pandas Series, without importing
+    either of them.
+
+    Args:
+        data (Any): The data passed to cluster().
+
+    Returns:
+        bool: True if the data should be read as a list column.
+    """
+    module = type(data).__module__
+    return module.startswith("pyarrow") or (
+        module.startswith("pandas") and hasattr(data, "iloc")
+    )
+
+
+def _encode_list_column(data: Any) -> Tuple[EncodedCorpus, "_ListColumnRows"]:
+    """
+    This function encodes a list column the way EncodedCorpus.encode encodes rows of tags, with
+    Arrow compute kernels working chunk by chunk. Tags are dictionary-encoded, their occurrences
+    counted with value_counts, and the offsets and codes of the corpus are copied from the
+    buffers of the resulting arrays, so neither tags nor codes become Python objects.
+
+    Args:
+        data (Any): A pyarrow ListArray, LargeListArray or ChunkedArray of them, or a pandas
+            Series of lists.
+
+    Returns:
+        Tuple[EncodedCorpus, _ListColumnRows]: The encoded records, with row positions as ids,
+        and the rows of the column, read back lazily for the output.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError as error:
+        raise ImportError(
+            "pyarrow is required to cluster Arrow or pandas columns, "
+            "install it with `pip install categorical-cluster[arrow]`"
+        ) from error
+
+    column = data
+    if not isinstance(column, (pa.Array, pa.ChunkedArray)):
+        column = pa.array(column, from_pandas=True)
+    if not (pa.types.is_list(column.type) or pa.types.is_large_list(column.type)):
+        raise TypeError(f"Expected a column of lists of tags, got {column.type}")
+    chunks = column.chunks if isinstance(column, pa.ChunkedArray) else [column]
+
+    # Dictionary-encoding the chunked array keeps one dictionary for all chunks, in order of
+    # first occurrence.
+    tags = [pc.list_flatten(x) for x in chunks]
+    tag_codes = pa.chunked_array(
+        [
+            x.indices
+            for x in pc.dictionary_encode(
+                pa.chunked_array(tags, type=column.type.value_type)
+            ).chunks
+        ],
+        pa.int32(),
+    )
+    tag_counts = pc.value_counts(tag_codes)
+    tag_counts = tag_counts.filter(tag_counts.field("values").is_valid())
+    tag_counts = tag_counts.take(pc.sort_indices(tag_counts.field("values")))
+    shared = pc.greater(tag_counts.field("counts"), 1)
+    similarity_tags = pc.sum(shared, min_count=0).as_py()
+    recode = pc.if_else(
+        shared,
+        pc.subtract(pc.cumulative_sum(shared.cast(pa.int32())), 1),
+        pc.add(pc.cumulative_sum(pc.invert(shared).cast(pa.int32())), similarity_tags - 1),
+    )
+
+    ids = array(ID_FORMAT)
+    offsets = array(OFFSET_FORMAT, [0])
+    codes = array(CODE_FORMAT)
+    similarity_lengths = array(CODE_FORMAT)
+    first_row = 0
+    first_tag = 0
+    for chunk, chunk_tags in zip(chunks, tags):
+        rows = pa.table(
+            {
+                "row": pc.list_parent_indices(chunk),
+                "code": pc.take(recode, tag_codes.slice(first_tag, len(chunk_tags))),
+            }
+        )
+        rows = rows.filter(pc.is_valid(rows.column("code")))
+        rows = rows.take(
+            pc.sort_indices(rows, sort_keys=[("row", "ascending"), ("code", "ascending")])
+        )
+        row, code = rows.column("row"), rows.column("code")
+        if len(rows) > 1:
+            repeated = pc.and_(
+                pc.equal(row[1:], row[:-1]), pc.equal(code[1:], code[:-1])
+            )
+            rows = rows.filter(pa.chunked_array([[True], pc.invert(repeated)]))
+            row, code = rows.column("row"), rows.column("code")
+
+        # value_counts lists values in order of first occurrence, so rows stay in order.
+        similarity_rows = pc.value_counts(row.filter(pc.less(code, similarity_tags)))
+        rows = rows.filter(pc.is_in(row, value_set=similarity_rows.field("values")))
+        row_lengths = pc.value_counts(rows.column("row")).field("counts")
+        _extend(ids, pc.add(similarity_rows.field("values"), first_row), pa.int64())
+        _extend(codes, rows.column("code"), pa.int32())
+        _extend(
+            offsets, pc.add(pc.cumulative_sum(row_lengths), offsets[-1]), pa.int64()
+        )
+        _extend(similarity_lengths, similarity_rows.field("counts"), pa.int32())
+        first_row += len(chunk)
+        first_tag += len(chunk_tags)
+    return (
+        EncodedCorpus(ids, offsets, codes, similarity_lengths, similarity_tags),
+        _ListColumnRows(column),
+    )
+
+
+def _extend(target: array, values: Any, value_type: Any) -> None:
+    """
+    This function appends the values of an Arrow array without nulls to an array, copying
+    its data buffer.
+
+    Args:
+        target (array): The array to extend.
+        values (Any): A pyarrow Array or ChunkedArray of integers.
+        value_type (Any): The pyarrow type matching the format of the target.
+    """
+    chunks = values.chunks if hasattr(values, "chunks") else [values]
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        chunk = chunk.cast(value_type)
+        size = target.itemsize
+        data = memoryview(chunk.buffers()[1])
+        target.frombytes(data[chunk.offset * size : (chunk.offset + len(chunk)) * size])
+
+
+class _ListColumnRows:
+    """
+    Rows of a list column, converted to Python lists only when accessed. Used as the source
+    data of the output, so only clustered rows are materialized.
+    """
+
+    def __init__(self, column: Any):
+        self._column = column
+
+    def __len__(self) -> int:
+        return len(self._column)
+
+    def __getitem__(self, index: int) -> list:
+        return self._column[index].as_py()
@@ -0,0 +1,357 @@
+import asyncio
+import hashlib
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Optional, Tuple, Union
+
+from cluster.categorical_cluster import cluster
+from cluster.engines import ClusteringEngine, _get_engine
+
+
+class ClusteringCancelled(Exception):
+    """
+    Raised in the clustering thread, between merge rounds, once every job waiting for the
+    computation was cancelled.
+    """
+
+
+class AsyncClusterRunner:
+    """
+    Runs cluster() for asyncio code without blocking the event loop.
+
+    Computations run in a thread pool owned by the runner, sharing one engine, so with
+    workers > 1 the scoring loops of all jobs use the same process pool. Requests for the same
+    data with the same parameters made while a computation is in flight are coalesced into it.
+    """
+
+    def __init__(
+        self,
+        max_jobs: Optional[int] = None,
+        workers: int = 1,
+        engine: Union[None, str, ClusteringEngine] = None,
+    ):
+        """
+        Args:
+            max_jobs (int, optional): Maximum number of computations running at the same time.
+                Defaults to the ThreadPoolExecutor default.
+            workers (int, optional): Number of processes for the scoring loops, see cluster().
+                Defaults to 1.
+            engine (str or ClusteringEngine, optional): Engine shared by all computations, see
+                cluster(). Engines created here from a name are closed by aclose().
+        """
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_jobs, thread_name_prefix="categorical-cluster"
+        )
+        self.engine, self._owned_engine = _get_engine(engine, workers)
+        self._in_flight = {}
+        self._joining = set()
+
+    def submit(
+        self,
+        data: list,
+        min_elements_in_cluster: int,
+        min_similarity_first_iter: float,
+        min_similarity_next_iters: float = None,
+        max_rounds: int = None,
+        time_budget: float = None,
+        min_gain: float = None,
+        cache_dir: str = None,
+    ) -> "ClusterJob":
+        """
+        This function starts clustering the data, or joins the identical computation in flight.
+        It has to be called from a coroutine. Arguments are the ones of cluster(), and the data
+        must not be modified until the job is done. The data is fingerprinted in the thread pool
+        of the runner, so the request joins a computation shortly after this function returns.
+
+        Returns:
+            ClusterJob: The job, to be awaited for the clusters.
+        """
+        if not min_similarity_next_iters:
+            min_similarity_next_iters = min_similarity_first_iter
+        params = dict(
+            min_elements_in_cluster=min_elements_in_cluster,
+            min_similarity_first_iter=min_similarity_first_iter,
+            min_similarity_next_iters=min_similarity_next_iters,
+            max_rounds=max_rounds,
+            time_budget=time_budget,
+            min_gain=min_gain,
+            cache_dir=cache_dir,
+        )
+        loop = asyncio.get_running_loop()
+        key = asyncio.wrap_future(
+            self.executor.submit(_request_key, data, params), loop=loop
+        )
+        joined = asyncio.ensure_future(self._join(key, data, params))
+        self._joining.add(joined)
+        joined.add_done_callback(self._joining.discard)
+        return ClusterJob(self, joined)
+
+    async def aclose(self) -> None:
+        """
+        This function cancels the computations in flight and waits for the threads and the
+        engine to shut down.
+        """
+        for joined in list(self._joining):
+            joined.cancel()
+        for key in list(self._in_flight):
+            self._cancel(key, self._in_flight[key])
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.executor.shutdown)
+        if self._owned_engine:
+            self.engine.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def _join(
+        self, key: "asyncio.Future[tuple]", data: list, params: Dict
+    ) -> Tuple[tuple, "_Computation"]:
+        """
+        This function waits for the fingerprint of a request and starts its computation, or
+        joins the identical one in flight.
+        """
+        key = await key
+        computation = self._in_flight.get(key)
+        if computation is None:
+            loop = asyncio.get_running_loop()
+            computation = _Computation(loop)
+            computation.future = asyncio.wrap_future(
+                self.executor.submit(self._run, computation, data, params), loop=loop
+            )
+            computation.future.add_done_callback(
+                lambda _: self._finished(key, computation)
+            )
+            self._in_flight[key] = computation
+        computation.jobs += 1
+        return key, computation
+
+    def _run(self, computation: "_Computation", data: list, params: Dict) -> list:
+        return cluster(
+            data, engine=self.engine, on_round=computation.on_round, **params
+        )
+
+    def _release(self, key: tuple, computation: "_Computation") -> None:
+        computation.jobs -= 1
+        if computation.jobs == 0 and not computation.future.done():
+            self._cancel(key, computation)
+
+    def _cancel(self, key: tuple, computation: "_Computation") -> None:
+        computation.cancelled.set()
+        computation.future.cancel()
+        self._finished(key, computation)
+
+    def _finished(self, key: tuple, computation: "_Computation") -> None:
+        if self._in_flight.get(key) is computation:
+            del self._in_flight[key]
+        computation.publish(None)
+
+
+class ClusterJob:
+    """
+    A request for clusters. Awaiting the job returns the output of cluster(); jobs coalesced
+    into one computation share it, so it should not be modified.
+    """
+
+    def __init__(
+        self, runner: AsyncClusterRunner, joined: "asyncio.Future[Tuple[tuple, _Computation]]"
+    ):
+        self._runner = runner
+        self._joined = joined
+        self._cancelled = False
+
+    def __await__(self):
+        return self._result().__await__()
+
+    async def _result(self) -> list:
+        if self._cancelled:
+            raise asyncio.CancelledError()
+        try:
+            _, computation = await asyncio.shield(self._joined)
+            return await asyncio.shield(computation.future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def cancel(self) -> None:
+        """
+        This function withdraws the job. The computation stops at the next merge round once
+        no job is waiting for it.
+        """
+        if not self._cancelled:
+            self._cancelled = True
+            if self._joined.done():
+                if not self._joined.cancelled() and self._joined.exception() is None:
+                    self._runner._release(*self._joined.result())
+            else:
+                self._joined.cancel()
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def done(self) -> bool:
+        if self._cancelled:
+            return True
+        if not self._joined.done():
+            return False
+        if self._joined.cancelled() or self._joined.exception() is not None:
+            return True
+        return self._joined.result()[1].future.done()
+
+    async def progress(self) -> AsyncIterator[Dict]:
+        """
+        This function yields the progress of the computation: the merge 'round' and the number
+        of clusters 'finalized' so far, starting with the latest state. It ends when the
+        computation is done, cancelled or failed; awaiting the job tells which.
+        """
+        try:
+            _, computation = await asyncio.shield(self._joined)
+        except asyncio.CancelledError:
+            if not self._joined.cancelled():
+                raise
+            return
+        except Exception:
+            return
+        queue = asyncio.Queue()
+        computation.listeners.add(queue)
+        try:
+            if computation.progress is not None:
+                queue.put_nowait(computation.progress)
+            if computation.future.done():
+                queue.put_nowait(None)
+            while True:
+                progress = await queue.get()
+                if progress is None:
+                    return
+                yield progress
+        finally:
+            computation.listeners.discard(queue)
+
+
+class _Computation:
+    """
+    A cluster() call in the thread pool with the jobs waiting for it.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = None
+        self.jobs = 0
+        self.cancelled = threading.Event()
+        self.progress = None
+        self.listeners = set()
+
+    def on_round(self, rounds: int, finalized: int) -> None:
+        """
+        This function runs in the clustering thread after every merge round.
+        """
+        if self.cancelled.is_set():
+            raise ClusteringCancelled()
+        self.loop.call_soon_threadsafe(
+            self.publish, {"round": rounds, "finalized": finalized}
+        )
+
+    def publish(self, progress: Optional[Dict]) -> None:
+        """
+        This function passes progress, or None once the computation is over, to the listeners.
+        """
+        if progress is not None:
+            if self.future.done():
+                return
+            self.progress = progress
+        for queue in self.listeners:
+            queue.put_nowait(progress)
+
+
+def _request_key(data: list, params: Dict) -> tuple:
+    """
+    This function fingerprints the rows and parameters of a request, so identical requests are
+    coalesced. It runs in a thread, as it goes through every tag of the data. Arrow columns are
+    fingerprinted by their buffers, without converting rows to Python objects.
+
+    Args:
+        data (list): The data to be clustered, in any format accepted by cluster().
+        params (Dict): The keyword arguments of cluster().
+
+    Returns:
+        tuple: The key of the request.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    if type(data).__module__.startswith("pyarrow"):
+        _update_with_buffers(digest, data)
+    else:
+        for row in data:
+            digest.update(b"\x1e" + repr(list(row) if row is not None else row).encode())
+    return (digest.hexdigest(), tuple(sorted(params.items())))
+
+
+def _update_with_buffers(digest: "hashlib._Hash", column) -> None:
+    """
+    This function hashes a pyarrow Array or ChunkedArray: its type, and for every chunk the
+    list offsets, validity and values buffers with the offsets and lengths selecting the rows
+    from them. Columns with the same rows in other chunks or buffers get other keys, so such
+    requests are just not coalesced.
+
+    Args:
+        digest (hashlib._Hash): The digest to update.
+        column: The pyarrow Array or ChunkedArray.
+    """
+    digest.update(str(column.type).encode())
+    for chunk in getattr(column, "chunks", [column]):
+        values_offset = chunk.values.offset if hasattr(chunk, "values") else 0
+        digest.update(struct.pack("<qqq", len(chunk), chunk.offset, values_offset))
+        for buffer in chunk.buffers():
+            if buffer is None:
+                digest.update(struct.pack("<q", -1))
+            else:
+                digest.update(struct.pack("<q", buffer.size))
+                digest.update(buffer)
+
+
+_default_runner = None
+
+
+def cluster_async(
+    data: list,
+    min_elements_in_cluster: int,
+    min_similarity_first_iter: float,
+    min_similarity_next_iters: float = None,
+    max_rounds: int = None,
+    time_budget: float = None,
+    min_gain: float = None,
+    cache_dir: str = None,
+    runner: Optional[AsyncClusterRunner] = None,
+) -> ClusterJob:
+    """
+    This function clusters the data in a thread without blocking the event loop. It has to be
+    called from a coroutine. Arguments are the ones of cluster().
+
+    The returned job is awaited for the clusters, and iterated with `job.progress()` for the
+    merge rounds. Cancelling the task awaiting it, or calling `job.cancel()`, stops the
+    computation between merge rounds once no other identical request waits for it.
+
+    Args:
+        runner (AsyncClusterRunner, optional): The runner of the computation. Defaults to a
+            runner shared by the process, with a single worker.
+
+    Returns:
+        ClusterJob: The job, to be awaited for the clusters.
+    """
+    global _default_runner
+    if runner is None:
+        if _default_runner is None:
+            _default_runner = AsyncClusterRunner()
+        runner = _default_runner
+    return runner.submit(
+        data,
+        min_elements_in_cluster,
+        min_similarity_first_iter,
+        min_similarity_next_iters,
+        max_rounds=max_rounds,
+        time_budget=time_budget,
+        min_gain=min_gain,
+        cache_dir=cache_dir,
+    )
@@ -0,0 +1,138 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from cluster.categorical_cluster import cluster
+from cluster.prepare_data import _prepare_output
+
+
+def cluster_many(
+    datasets: List[list],
+    min_elements_in_cluster: int,
+    min_similarity_first_iter: float,
+    min_similarity_next_iters: float = None,
+    workers: Optional[int] = None,
+) -> Tuple[List[list], List[Dict]]:
+    """
+    This function clusters many independent datasets in one call.
+
+    All datasets are encoded with one shared tag vocabulary, so workers receive lists of
+    integers instead of strings. Every dataset is a separate task in a single process pool
+    and tasks are submitted from the largest estimated pair count down, so a slow large
+    dataset occupies one worker while the others keep going.
+
+    Args:
+        datasets (List[list]): Datasets to be clustered, each in the format accepted by cluster().
+        min_elements_in_cluster (int): The minimum number of elements in a cluster.
+        min_similarity_first_iter (float): The minimum similarity for the first iteration.
+        min_similarity_next_iters (float, optional): The minimum similarity for the next iterations. Defaults to min_similarity_first_iter.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            With 1 worker the datasets are clustered in the current process.
+
+    Returns:
+        Tuple[List[list], List[Dict]]: Clusters of every dataset, in the format returned by cluster(),
+        and per-dataset stats ('records', 'estimated_pairs', 'clusters', 'seconds'), both in input order.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    params = {
+        "min_elements_in_cluster": min_elements_in_cluster,
+        "min_similarity_first_iter": min_similarity_first_iter,
+        "min_similarity_next_iters": min_similarity_next_iters,
+    }
+    encoded_datasets = _encode_datasets(datasets)
+    estimated_pairs = [_estimate_pairs(x) for x in encoded_datasets]
+    order = sorted(
+        range(len(datasets)), key=lambda x: estimated_pairs[x], reverse=True
+    )
+
+    row_numbers = [None] * len(datasets)
+    seconds = [None] * len(datasets)
+    if workers == 1 or len(datasets) <= 1:
+        for index in order:
+            _, row_numbers[index], seconds[index] = _cluster_encoded(
+                index, encoded_datasets[index], params
+            )
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(datasets))) as executor:
+            futures = [
+                executor.submit(_cluster_encoded, index, encoded_datasets[index], params)
+                for index in order
+            ]
+            for future in as_completed(futures):
+                index, clusters, duration = future.result()
+                row_numbers[index] = clusters
+                seconds[index] = duration
+
+    results = []
+    stats = []
+    for index, dataset in enumerate(datasets):
+        results.append(_prepare_output(row_numbers[index], dataset))
+        stats.append(
+            {
+                "records": len(dataset),
+                "estimated_pairs": estimated_pairs[index],
+                "clusters": len(row_numbers[index]),
+                "seconds": seconds[index],
+            }
+        )
+    return results, stats
+
+
+def _encode_datasets(datasets: List[list]) -> List[list]:
+    """
+    This function maps the tags of all datasets to integers using one shared vocabulary.
+
+    Args:
+        datasets (List[list]): Datasets with rows of tags.
+
+    Returns:
+        List[list]: Datasets with rows of tag codes.
+    """
+    vocabulary = {}
+    encoded_datasets = []
+    for dataset in datasets:
+        encoded = []
+        for row in dataset:
+            encoded.append([vocabulary.setdefault(tag, len(vocabulary)) for tag in row])
+        encoded_datasets.append(encoded)
+    return encoded_datasets
+
+
+def _estimate_pairs(encoded: list) -> int:
+    """
+    This function estimates the cost of clustering a dataset as the number of record pairs
+    scored in the first iteration. Only records with a tag that occurs more than once take part.
+
+    Args:
+        encoded (list): Dataset with rows of tag codes.
+
+    Returns:
+        int: The estimated number of pairs.
+    """
+    tag_counts = {}
+    for row in encoded:
+        for tag in row:
+            tag_counts[tag] = tag_counts.get(tag, 0) + 1
+    records = sum(1 for row in encoded if any(tag_counts[x] > 1 for x in row))
+    return records * (records - 1)
+
+
+def _cluster_encoded(index: int, encoded: list, params: Dict) -> Tuple[int, list, float]:
+    """
+    This function clusters a single encoded dataset. It runs in the worker processes.
+
+    Args:
+        index (int): Position of the dataset in the input of cluster_many().
+        encoded (list): Dataset with rows of tag codes.
+        params (Dict): Keyword arguments for cluster().
+
+    Returns:
+        Tuple[int, list, float]: The index, clusters as lists of row numbers and the duration in seconds.
+    """
+    start_time = time.time()
+    clusters = cluster(encoded, **params)
+    clusters = [[x["source_row_number"] for x in c] for c in clusters]
+    return index, clusters, time.time() - start_time
@@ -1,7 +1,12 @@
-import copy
+import time
+from typing import Callable
 
-from cluster.clustering_loop import _first_iteration_of_algo, _next_iteration_of_algo
+from cluster.arrow_input import _encode_list_column, _is_list_column
+from cluster.clustering_loop import _clustering_loop, _first_iteration_of_algo
+from cluster.engines import _get_engine
+from cluster.similarity_cache import DEFAULT_MAX_BYTES, SimilarityCache
 from cluster.prepare_data import (
+    _log_phase,
     _prepare_data,
     _prepare_output,
     _print_end_time,
@@ -17,78 +22,125 @@ def cluster(
     similarity_log_initial_iter: list = None,
     similrity_log_next_iter: list = None,
     print_start_end: bool = False,
+    workers: int = 1,
+    phase_log: list = None,
+    on_cluster_finalized: Callable[[list], None] = None,
+    max_rounds: int = None,
+    time_budget: float = None,
+    min_gain: float = None,
+    stop_report: dict = None,
+    cache_dir: str = None,
+    cache_max_bytes: int = DEFAULT_MAX_BYTES,
+    engine=None,
+    on_round: Callable[[int, int], None] = None,
 ) -> list:
     """
     This function performs clustering on the given data.
 
     Args:
-        data (list): The data to be clustered.
+        data (list): The data to be clustered. A pyarrow ListArray/ChunkedArray or a pandas Series
+            of lists is read without converting the tags to Python strings.
         min_elements_in_cluster (int): The minimum number of elements in a cluster.
         min_similarity_first_iter (float): The minimum similarity for the first iteration.
         min_similarity_next_iters (float, optional): The minimum similarity for the next iterations. Defaults to similarity_first_iteration.
         clustering_log_initial (list, optional): The initial clustering log.
         clustering_log_next (list, optional): The next clustering log.
         print_start_end (bool, optional): Whether to print the start and end time.
+        workers (int, optional): Number of processes for the scoring loops. Defaults to 1,
+            which runs everything in the current process. More workers select the process_pool engine.
+        phase_log (list, optional): If provided, duration and peak memory of every phase are appended to it.
+        on_cluster_finalized (Callable[[list], None], optional): Called with every cluster, in the output
+            format, as soon as it is finalized. Clusters are finalized in a different order than the
+            returned list, which is sorted by size.
+        max_rounds (int, optional): Maximum number of merge rounds after the first iteration.
+        time_budget (float, optional): Seconds since the start of clustering after which no new merge
+            round is started. The first iteration always runs to completion.
+        min_gain (float, optional): End the merge loop once the pending merges would add less than
+            this fraction of new members, relative to the smaller cluster of each merged pair: 0 never
+            stops, 1 stops unless every merged pair is disjoint.
+        stop_report (dict, optional): If provided, it is filled with the number of merge 'rounds',
+            'stopped_early', 'stop_reason' and the number of 'pending_merges' left when stopped.
+        cache_dir (str, optional): Directory caching the first iteration similarity lists between runs.
+            Runs on the same data with the same min_similarity_first_iter skip first iteration scoring.
+        cache_max_bytes (int, optional): Size limit of cache_dir, least recently used entries are
+            evicted first. Defaults to 1 GiB.
+        engine (str or ClusteringEngine, optional): Implementation of the similarity and merge steps,
+            an instance or a name from cluster.engines.ENGINES. Defaults to 'reference', or
+            'process_pool' when workers > 1.
+        on_round (Callable[[int, int], None], optional): Called after the first iteration and after every
+            merge round with the number of merge rounds done and of clusters finalized so far. An
+            exception raised by it stops clustering and is propagated.
 
     Returns:
         list: The final clusters after performing clustering.
     """
-    if not (0 < min_similarity_first_iter < 1) or not (0 < min_similarity_next_iters < 1):
-        raise "Similarities should be in range 0 < x < 1"
-
-    if print_start_end:
-        start_time = _print_start_time()
-
-    original_data = copy.deepcopy(data)
-    data = _prepare_data(data)
-
     if not min_similarity_next_iters:
         min_similarity_next_iters = min_similarity_first_iter
 
-    final_clusters = []
-
-    (
-        empty_similarity_clusters,
-        pairs_to_merge,
-        previous_clusters,
-    ) = _first_iteration_of_algo(
-        data,
-        min_similarity_first_iter,
-        min_elements_in_cluster=min_elements_in_cluster,
-        clustering_logs=similarity_log_initial_iter,
-    )
-
-    if empty_similarity_clusters:
-        final_clusters.extend(empty_similarity_clusters)
+    if not (0 < min_similarity_first_iter < 1) or not (0 < min_similarity_next_iters < 1):
+        raise ValueError("Similarities should be in range 0 < x < 1")
+    if max_rounds is not None and max_rounds < 0:
+        raise ValueError("max_rounds should not be negative")
+    if time_budget is not None and time_budget <= 0:
+        raise ValueError("time_budget should be positive")
+    if min_gain is not None and not (0 <= min_gain <= 1):
+        raise ValueError("min_gain should be in range 0 <= x <= 1")
 
-    while len(pairs_to_merge) > 0:
-        new_pairs_to_merge, new_clusters = _next_iteration_of_algo(
+    if print_start_end:
+        start_time = _print_start_time()
+    phase_start_time = time.time()
+    deadline = None if time_budget is None else phase_start_time + time_budget
+
+    engine, owned_engine = _get_engine(engine, workers)
+    try:
+        if _is_list_column(data):
+            data, original_data = _encode_list_column(data)
+        else:
+            original_data = data
+            data = _prepare_data(data)
+        phase_start_time = _log_phase(phase_log, "prepare", phase_start_time)
+
+        on_finalized = None
+        if on_cluster_finalized is not None:
+            on_finalized = lambda x: on_cluster_finalized(
+                _prepare_output([x], original_data)[0]
+            )
+
+        (
+            empty_similarity_clusters,
+            pairs_to_merge,
+            previous_clusters,
+        ) = _first_iteration_of_algo(
+            data,
+            min_similarity_first_iter,
+            min_elements_in_cluster=min_elements_in_cluster,
+            clustering_logs=similarity_log_initial_iter,
+            engine=engine,
+            cache=None if cache_dir is None else SimilarityCache(cache_dir, cache_max_bytes),
+        )
+        phase_start_time = _log_phase(phase_log, "first_iteration", phase_start_time)
+        final_clusters = _clustering_loop(
+            empty_similarity_clusters,
             pairs_to_merge,
             previous_clusters,
-            final_clusters,
             min_similarity=min_similarity_next_iters,
             min_elements_in_cluster=min_elements_in_cluster,
             clustering_logs=similrity_log_next_iter,
+            engine=engine,
+            on_finalized=on_finalized,
+            max_rounds=max_rounds,
+            deadline=deadline,
+            min_gain=min_gain,
+            stop_report=stop_report,
+            on_round=on_round,
         )
-        pairs_to_merge = new_pairs_to_merge
-        previous_clusters = new_clusters
-
-        if len(pairs_to_merge) == 0:
-            remaining_clusters = new_clusters
-            remaining_clusters = [x["all_elements"] for x in remaining_clusters]
-
-            for i in range(len(remaining_clusters)):
-                for j in range(len(remaining_clusters[i])):
-                    if isinstance(remaining_clusters[i][j], tuple):
-                        remaining_clusters[i][j] = remaining_clusters[i][j][0]
-                remaining_clusters[i] = tuple(set(remaining_clusters[i]))
-
-            for remaining_cluster in remaining_clusters:
-                if not remaining_cluster in final_clusters:
-                    final_clusters.append(remaining_cluster)
-
-    final_clusters = sorted(final_clusters, key=lambda x: len(x))
+        phase_start_time = _log_phase(phase_log, "next_iterations", phase_start_time)
+    finally:
+        if owned_engine:
+            engine.close()
 
+    output = _prepare_output(final_clusters, original_data)
+    _log_phase(phase_log, "output", phase_start_time)
     if print_start_end:
         _print_end_time(start_time)
-    return _prepare_output(final_clusters, original_data)
+    return output
@@ -0,0 +1,321 @@
+import argparse
+import json
+import pickle
+import sys
+from typing import IO, Iterator, List, Optional
+
+from cluster.categorical_cluster import cluster
+from cluster.engine_verification import verify_engine
+from cluster.engines import ENGINES
+
+EXIT_OK = 0
+EXIT_IO_ERROR = 1
+EXIT_INVALID_PARAMETERS = 2
+EXIT_ENGINE_DIVERGENCE = 3
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Entry point of the `categorical-cluster` console script. Reads rows of tags from JSONL or
+    Parquet, writes every cluster as a JSON line as soon as it is finalized and prints the
+    per-phase timing and memory report to stderr.
+
+    Args:
+        argv (List[str], optional): Command line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit code.
+    """
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        data = _read_input(args.input, args.format, args.column)
+    except (OSError, ValueError, ImportError) as error:
+        print(f"categorical-cluster: cannot read {args.input}: {error}", file=sys.stderr)
+        return EXIT_IO_ERROR
+
+    if args.verify:
+        return _verify(args, data)
+
+    try:
+        output = sys.stdout if args.output == "-" else open(args.output, "w")
+    except OSError as error:
+        print(f"categorical-cluster: cannot write {args.output}: {error}", file=sys.stderr)
+        return EXIT_IO_ERROR
+    phase_log = []
+    stop_report = {}
+    try:
+        clusters = cluster(
+            data,
+            min_elements_in_cluster=args.min_elements_in_cluster,
+            min_similarity_first_iter=args.min_similarity_first_iter,
+            min_similarity_next_iters=args.min_similarity_next_iters,
+            workers=args.workers,
+            phase_log=phase_log,
+            on_cluster_finalized=lambda x: _write_cluster(output, x),
+            max_rounds=args.max_rounds,
+            time_budget=args.time_budget,
+            min_gain=args.min_gain,
+            stop_report=stop_report,
+            cache_dir=args.cache_dir,
+            engine=args.engine,
+        )
+    except ValueError as error:
+        print(f"categorical-cluster: {error}", file=sys.stderr)
+        return EXIT_INVALID_PARAMETERS
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    _print_report(phase_log, stop_report, len(data), len(clusters))
+    return EXIT_OK
+
+
+def _verify(args: argparse.Namespace, data) -> int:
+    """
+    This function runs the --verify mode.
+
+    Returns:
+        int: EXIT_OK if the engine is equivalent to the reference engine, EXIT_ENGINE_DIVERGENCE otherwise.
+    """
+    if not isinstance(data, list):
+        data = data.to_pylist()
+    try:
+        result = verify_engine(
+            args.engine or ("process_pool" if args.workers > 1 else "reference"),
+            datasets=[data],
+            random_datasets=args.random_datasets,
+            min_elements_in_cluster=args.min_elements_in_cluster,
+            min_similarity_first_iter=args.min_similarity_first_iter,
+            min_similarity_next_iters=args.min_similarity_next_iters,
+            workers=args.workers,
+        )
+    except ValueError as error:
+        print(f"categorical-cluster: {error}", file=sys.stderr)
+        return EXIT_INVALID_PARAMETERS
+    if result["equivalent"]:
+        print(f"engine is equivalent on {result['datasets']} datasets", file=sys.stderr)
+        return EXIT_OK
+    divergence = result["divergence"]
+    dataset = "input" if divergence["dataset"] == 0 else f"random dataset {divergence['dataset']}"
+    print(
+        f"engine diverges on {dataset}, step '{divergence['step']}', round {divergence['round']}, "
+        f"element {divergence['index']}:\n"
+        f"  reference: {divergence['reference']!r}\n"
+        f"  engine:    {divergence['engine']!r}",
+        file=sys.stderr,
+    )
+    return EXIT_ENGINE_DIVERGENCE
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="categorical-cluster",
+        description="Cluster rows of categorical tags read from JSONL or Parquet.",
+    )
+    parser.add_argument(
+        "input",
+        help="JSONL file with a list of tags (or an object with the tags column) per line, "
+        "a Parquet file with a list<string> column, or - for JSONL on stdin",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="JSONL file to write clusters to, one cluster per line (default: stdout)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["jsonl", "parquet", "pickle"],
+        help="input format (default: parquet for .parquet and .pq files, jsonl otherwise; "
+        "pickle can run arbitrary code when loaded, so it is only read when given here)",
+    )
+    parser.add_argument(
+        "--column",
+        default="tags",
+        help="name of the tags column in Parquet or JSONL objects (default: tags)",
+    )
+    parser.add_argument(
+        "--min-similarity-first-iter", type=_similarity, required=True
+    )
+    parser.add_argument("--min-similarity-next-iters", type=_similarity)
+    parser.add_argument("--min-elements-in-cluster", type=_positive_int, required=True)
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=1,
+        help="number of processes for the scoring loops (default: 1)",
+    )
+    parser.add_argument(
+        "--max-rounds",
+        type=_non_negative_int,
+        help="maximum number of merge rounds after the first iteration",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=_positive_float,
+        help="seconds after which no new merge round is started",
+    )
+    parser.add_argument(
+        "--min-gain",
+        type=_fraction,
+        help="end merging once merges add less than this fraction of new members, relative "
+        "to the smaller cluster of each merged pair (0 to 1)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="directory caching first iteration similarity lists between runs",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=list(ENGINES),
+        help="implementation of the similarity and merge steps "
+        "(default: reference, or process_pool with more than 1 worker)",
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="instead of clustering, run the engine and the reference engine side by side "
+        "on the input and randomized datasets and report the first divergence",
+    )
+    parser.add_argument(
+        "--random-datasets",
+        type=_non_negative_int,
+        default=5,
+        help="number of randomized datasets used by --verify (default: 5)",
+    )
+    return parser
+
+
+def _similarity(value: str) -> float:
+    try:
+        similarity = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid similarity: {value!r}")
+    if not (0 < similarity < 1):
+        raise argparse.ArgumentTypeError(
+            f"similarity should be in range 0 < x < 1, got {value}"
+        )
+    return similarity
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"should be at least 1, got {value}")
+    return number
+
+
+def _non_negative_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"should not be negative, got {value}")
+    return number
+
+
+def _positive_float(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value!r}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"should be positive, got {value}")
+    return number
+
+
+def _fraction(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value!r}")
+    if not (0 <= number <= 1):
+        raise argparse.ArgumentTypeError(f"should be in range 0 <= x <= 1, got {value}")
+    return number
+
+
+def _read_input(path: str, format: Optional[str], column: str):
+    """
+    This function reads the rows of tags to be clustered.
+
+    Returns:
+        list or pyarrow.ChunkedArray: Rows of tags. Parquet is read batch by batch into an Arrow
+        column, so tags are not converted to Python strings.
+    """
+    if format is None:
+        # Pickle is never guessed from the extension, loading it can run arbitrary code.
+        format = "parquet" if path.endswith((".parquet", ".pq")) else "jsonl"
+
+    if format == "pickle":
+        with open(path, "rb") as file:
+            return pickle.load(file)
+
+    if format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        if column not in parquet_file.schema_arrow.names:
+            raise ValueError(f"no column {column!r}")
+        batches = [
+            x.column(0) for x in parquet_file.iter_batches(columns=[column])
+        ]
+        return pa.chunked_array(batches, type=parquet_file.schema_arrow.field(column).type)
+
+    if path == "-":
+        return list(_read_jsonl(sys.stdin, column))
+    with open(path) as file:
+        return list(_read_jsonl(file, column))
+
+
+def _read_jsonl(file: IO, column: str) -> Iterator[list]:
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        if isinstance(row, dict):
+            if column not in row:
+                raise ValueError(f"line {line_number} has no {column!r} column")
+            row = row[column]
+        if not isinstance(row, list):
+            raise ValueError(f"line {line_number} is not a list of tags")
+        if any(isinstance(x, (list, dict)) for x in row):
+            raise ValueError(f"line {line_number} has a tag that is not a string or number")
+        yield row
+
+
+def _write_cluster(output: IO, cluster_elements: list) -> None:
+    output.write(json.dumps(cluster_elements) + "\n")
+    output.flush()
+
+
+def _print_report(
+    phase_log: List[dict], stop_report: dict, rows: int, clusters: int
+) -> None:
+    print(
+        f"{rows} rows, {clusters} clusters, {stop_report['rounds']} merge rounds",
+        file=sys.stderr,
+    )
+    if stop_report["stopped_early"]:
+        print(
+            f"stopped early ({stop_report['stop_reason']}), "
+            f"{stop_report['pending_merges']} merges pending",
+            file=sys.stderr,
+        )
+    for phase in phase_log:
+        max_rss = phase["max_rss_mb"]
+        max_rss = "n/a" if max_rss is None else f"{max_rss:.1f} MB"
+        print(
+            f"{phase['phase']:<16} {phase['seconds']:>9.3f} s   max rss {max_rss}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,52 +1,96 @@
 import copy
-from typing import Optional, Tuple, List, Dict
+import time
+from typing import Callable, Optional, Tuple, List, Dict
 
 from cluster.clustering_utils import (
-    _merge_algo,
     _get_cluster,
-    _merge_pairs,
-    _initial_similarity_against_all,
     _clean_up_first_iteration,
     _remove_duplicates_from_first_iter,
-    _similarity_agains_all,
     _get_empty_similarity_first_iter,
     _get_iteration_of_empty_clusters,
-    _merge_algo,
+    _union_members,
 )
+from cluster.encoded_corpus import EncodedCorpus
+from cluster.engines import ClusteringEngine, ReferenceEngine
+from cluster.similarity_cache import SimilarityCache
 
 
 def _first_iteration_of_algo(
-    combined: list,
+    corpus: EncodedCorpus,
     min_similarity: float,
     min_elements_in_cluster: int,
     clustering_logs: Optional[list] = None,
+    engine: Optional[ClusteringEngine] = None,
+    cache: Optional[SimilarityCache] = None,
 ) -> Tuple[list, list, list]:
     """
     This function performs the first iteration of the clustering algorithm.
 
     Args:
-        combined (list): The combined data to be clustered.
+        corpus (EncodedCorpus): The encoded records to be clustered.
         min_similarity (float): The minimum similarity threshold for clustering.
         min_elements_in_cluster (int): The minimum number of elements in a cluster.
         clustering_logs (list, optional): Logs for the clustering process. Defaults to None.
+        engine (ClusteringEngine, optional): Implementation of the similarity and merge steps.
+            Defaults to ReferenceEngine.
+        cache (SimilarityCache, optional): Cache of the record-level similarity lists. It is not
+            used when clustering_logs are collected, as cached runs skip scoring. Defaults to None.
 
     Returns:
         Tuple[list, list, list]: Returns a tuple containing lists of empty similarity clusters, pairs to merge, and clusters.
     """
-    summary = []
-    for record in combined:
-        summary.append(
-            _initial_similarity_against_all(
-                record, combined, min_similarity, clustering_logs
-            )
+    if engine is None:
+        engine = ReferenceEngine()
+    if cache is not None and clustering_logs is None:
+        summary = cache.first_iteration_summary(
+            corpus,
+            min_similarity,
+            lambda: engine.first_iteration_summary(corpus, min_similarity),
         )
-    summary = [x for x in summary if x["similarity"]]
+    else:
+        summary = engine.first_iteration_summary(
+            corpus, min_similarity, clustering_logs
+        )
+    return _first_iteration_from_summary(
+        summary,
+        min_similarity,
+        min_elements_in_cluster,
+        clustering_logs,
+        engine=engine,
+    )
+
+
+def _first_iteration_from_summary(
+    summary: List[Dict],
+    min_similarity: float,
+    min_elements_in_cluster: int,
+    clustering_logs: Optional[list] = None,
+    engine: Optional[ClusteringEngine] = None,
+) -> Tuple[list, list, list]:
+    """
+    This function builds the first iteration clusters out of the record-level similarity lists.
+
+    Args:
+        summary (List[Dict]): Records with their similarity lists, see _first_iteration_summary.
+        min_similarity (float): The minimum similarity threshold for clustering.
+        min_elements_in_cluster (int): The minimum number of elements in a cluster.
+        clustering_logs (list, optional): Logs for the clustering process. Defaults to None.
+        engine (ClusteringEngine, optional): Implementation of the similarity and merge steps.
+            Defaults to ReferenceEngine.
+
+    Returns:
+        Tuple[list, list, list]: Returns a tuple containing lists of empty similarity clusters, pairs to merge, and clusters.
+    """
+    if engine is None:
+        engine = ReferenceEngine()
     clusters = _clean_up_first_iteration(summary)
     clusters = _remove_duplicates_from_first_iter(clusters)
-    clusters = sorted(clusters, key=lambda x: len(x["all_elements"]))
+    clusters = sorted(clusters, key=lambda x: x["order_size"])
     clusters_copy = copy.deepcopy(clusters)
-    similars = _similarity_agains_all(clusters_copy, min_similarity, clustering_logs)
-    touched_cluster_ids, empty_similarity, pairs_to_merge = _merge_algo(
+    similars = engine.similarity_against_all(
+        clusters_copy, min_similarity, clustering_logs
+    )
+    touched_cluster_ids, empty_similarity, pairs_to_merge = engine.merge_algo(
         clusters, similars
     )
     untouched_empty_similarity = _get_empty_similarity_first_iter(
@@ -65,6 +109,7 @@ def _next_iteration_of_algo(
     min_similarity: float,
     min_elements_in_cluster: int,
     clustering_logs: Optional[List] = None,
+    engine: Optional[ClusteringEngine] = None,
 ) -> Tuple[List[Tuple[int, int]], List[Dict]]:
     """
     This function performs all remaining iterations of clustering after first iteration is completed.
@@ -76,25 +121,29 @@ def _next_iteration_of_algo(
         min_similarity (float): The minimum similarity threshold for clustering.
         min_elements_in_cluster (int): The minimum number of elements in a cluster.
         clustering_logs (List, optional): Logs for the clustering process. Defaults to None.
+        engine (ClusteringEngine, optional): Implementation of the similarity and merge steps.
+            Defaults to ReferenceEngine.
 
     Returns:
         Tuple[List[Tuple[int, int]], List[Dict]]: Returns a tuple containing lists of pairs to merge and new clusters.
     """
+    if engine is None:
+        engine = ReferenceEngine()
     new_cluster_id = 0
     new_clusters = []
 
     for pair in pairs_to_merge:
         cluster_1 = _get_cluster(pair[0], previous_clusters)
         cluster_2 = _get_cluster(pair[1], previous_clusters)
-        new_cluster = _merge_pairs(cluster_1, cluster_2, new_cluster_id)
+        new_cluster = engine.merge_pairs(cluster_1, cluster_2, new_cluster_id)
         new_cluster_id += 1
         new_clusters.append(new_cluster)
-    new_clusters = sorted(new_clusters, key=lambda x: len(x["all_elements"]))
+    new_clusters = sorted(new_clusters, key=lambda x: x["order_size"])
     new_clusters_copy = copy.deepcopy(new_clusters)
-    similaritries = _similarity_agains_all(
+    similaritries = engine.similarity_against_all(
         new_clusters, min_similarity, clustering_logs
     )
-    touched_cluster_ids, empty_similarity, pairs_to_merge = _merge_algo(
+    touched_cluster_ids, empty_similarity, pairs_to_merge = engine.merge_algo(
         new_clusters, similaritries
     )
     untouched_empty_similarity = _get_empty_similarity_first_iter(
@@ -108,3 +157,189 @@ def _next_iteration_of_algo(
     if empty_similarity_clusters:
         final_clusters.extend(empty_similarity_clusters)
     return pairs_to_merge, new_clusters_copy
+
+
+def _clustering_loop(
+    empty_similarity_clusters: list,
+    pairs_to_merge: List[Tuple[int, int]],
+    previous_clusters: List[Dict],
+    min_similarity: float,
+    min_elements_in_cluster: int,
+    clustering_logs: Optional[List] = None,
+    engine: Optional[ClusteringEngine] = None,
+    on_finalized: Optional[Callable[[tuple], None]] = None,
+    max_rounds: Optional[int] = None,
+    deadline: Optional[float] = None,
+    min_gain: Optional[float] = None,
+    stop_report: Optional[Dict] = None,
+    on_round: Optional[Callable[[int, int], None]] = None,
+) -> list:
+    """
+    This function merges clusters left by the first iteration until there are no pairs to merge,
+    or until one of the optional limits is hit. When the loop is stopped early, the clusters of
+    the last round are finalized the same way as after the last round of a complete run.
+
+    Args:
+        empty_similarity_clusters (list): Clusters finalized by the first iteration.
+        pairs_to_merge (List[Tuple[int, int]]): Pairs of clusters to be merged.
+        previous_clusters (List[Dict]): Clusters from the first iteration.
+        min_similarity (float): The minimum similarity threshold for clustering.
+        min_elements_in_cluster (int): The minimum number of elements in a cluster.
+        clustering_logs (List, optional): Logs for the clustering process. Defaults to None.
+        engine (ClusteringEngine, optional): Implementation of the similarity and merge steps.
+            Defaults to ReferenceEngine.
+        on_finalized (Callable[[tuple], None], optional): Called with every cluster as soon as it
+            is added to the final clusters. Defaults to None.
+        max_rounds (int, optional): Maximum number of merge rounds. Defaults to None, no limit.
+        deadline (float, optional): time.time() after which no new round is started. Defaults to None.
+        min_gain (float, optional): Stop when the pending merges would add less than this fraction
+            of the members of the smaller clusters as new members, see _merge_gain. Defaults to None.
+        stop_report (Dict, optional): If provided, it is updated with 'rounds', 'stopped_early',
+            'stop_reason' and 'pending_merges'.
+        on_round (Callable[[int, int], None], optional): Called before the first round and after
+            every round with the number of rounds done and of final clusters found so far. An
+            exception raised by it stops the loop. Defaults to None.
+
+    Returns:
+        list: The final clusters as tuples of record ids, sorted by size.
+    """
+    final_clusters = []
+
+    if empty_similarity_clusters:
+        final_clusters.extend(empty_similarity_clusters)
+    reported = _report_finalized(final_clusters, 0, on_finalized)
+
+    rounds = 0
+    stop_reason = None
+    if on_round is not None:
+        on_round(rounds, len(final_clusters))
+    while len(pairs_to_merge) > 0:
+        stop_reason = _stop_reason(
+            rounds, max_rounds, deadline, min_gain, pairs_to_merge, previous_clusters
+        )
+        if stop_reason is not None:
+            _finalize_remaining_clusters(previous_clusters, final_clusters)
+            reported = _report_finalized(final_clusters, reported, on_finalized)
+            break
+
+        new_pairs_to_merge, new_clusters = _next_iteration_of_algo(
+            pairs_to_merge,
+            previous_clusters,
+            final_clusters,
+            min_similarity=min_similarity,
+            min_elements_in_cluster=min_elements_in_cluster,
+            clustering_logs=clustering_logs,
+            engine=engine,
+        )
+        rounds += 1
+        pairs_to_merge = new_pairs_to_merge
+        previous_clusters = new_clusters
+        reported = _report_finalized(final_clusters, reported, on_finalized)
+
+        if len(pairs_to_merge) == 0:
+            _finalize_remaining_clusters(new_clusters, final_clusters)
+            reported = _report_finalized(final_clusters, reported, on_finalized)
+        if on_round is not None:
+            on_round(rounds, len(final_clusters))
+
+    if stop_report is not None:
+        stop_report.update(
+            {
+                "rounds": rounds,
+                "stopped_early": stop_reason is not None,
+                "stop_reason": stop_reason,
+                "pending_merges": len(pairs_to_merge),
+            }
+        )
+    return sorted(final_clusters, key=lambda x: len(x))
+
+
+def _finalize_remaining_clusters(
+    remaining_clusters: List[Dict], final_clusters: list
+) -> None:
+    """
+    This function adds the clusters left after the last round to the final clusters.
+
+    Args:
+        remaining_clusters (List[Dict]): Clusters of the last round.
+        final_clusters (list): The final clusters, updated in place.
+    """
+    present_clusters = set(final_clusters)
+    for remaining_cluster in remaining_clusters:
+        remaining_cluster = remaining_cluster["members"]
+        if remaining_cluster not in present_clusters:
+            present_clusters.add(remaining_cluster)
+            final_clusters.append(remaining_cluster)
+
+
+def _stop_reason(
+    rounds: int,
+    max_rounds: Optional[int],
+    deadline: Optional[float],
+    min_gain: Optional[float],
+    pairs_to_merge: List[Tuple[int, int]],
+    previous_clusters: List[Dict],
+) -> Optional[str]:
+    """
+    This function checks if the merge loop should stop before the next round.
+
+    Returns:
+        Optional[str]: 'max_rounds', 'time_budget' or 'min_gain', or None to continue.
+    """
+    if max_rounds is not None and rounds >= max_rounds:
+        return "max_rounds"
+    if deadline is not None and time.time() >= deadline:
+        return "time_budget"
+    if min_gain is not None and _merge_gain(pairs_to_merge, previous_clusters) < min_gain:
+        return "min_gain"
+    return None
+
+
+def _merge_gain(
+    pairs_to_merge: List[Tuple[int, int]], previous_clusters: List[Dict]
+) -> float:
+    """
+    This function measures how much the pending merges would change cluster membership: the
+    number of members each merged cluster gains over the larger of its two clusters, divided
+    by the size of the smaller one, which is the most it can gain.
+
+    Args:
+        pairs_to_merge (List[Tuple[int, int]]): Pairs of clusters to be merged.
+        previous_clusters (List[Dict]): Clusters from the previous iteration.
+
+    Returns:
+        float: The gain, from 0 (merges add no new members) to 1 (merged clusters are disjoint).
+    """
+    gained = 0
+    possible = 0
+    for pair in pairs_to_merge:
+        members_1 = _get_cluster(pair[0], previous_clusters)["members"]
+        members_2 = _get_cluster(pair[1], previous_clusters)["members"]
+        merged = len(_union_members(members_1, members_2))
+        gained += merged - max(len(members_1), len(members_2))
+        possible += min(len(members_1), len(members_2))
+    if possible == 0:
+        return 0.0
+    return gained / possible
+
+
+def _report_finalized(
+    final_clusters: list,
+    reported: int,
+    on_finalized: Optional[Callable[[tuple], None]],
+) -> int:
+    """
+    This function passes the clusters added to the final clusters since the last call to the callback.
+
+    Args:
+        final_clusters (list): The final clusters found so far.
+        reported (int): Number of final clusters already passed to the callback.
+        on_finalized (Callable[[tuple], None], optional): The callback.
+
+    Returns:
+        int: Number of final clusters passed to the callback.
+    """
+    if on_finalized is not None:
+        for final_cluster in final_clusters[reported:]:
+            on_finalized(final_cluster)
+    return len(final_clusters)
@@ -1,4 +1,6 @@
-from typing import Optional, Tuple, List, Dict
+from typing import Iterable, Optional, Sequence, Tuple, List, Dict
+
+from cluster.encoded_corpus import EncodedCorpus
 
 
 def _calculate_similarity(
@@ -73,6 +75,70 @@ def _initial_similarity_against_all(
     return original
 
 
+def _first_iteration_summary(
+    corpus: EncodedCorpus,
+    min_similarity: float,
+    clustering_logs: Optional[list] = None,
+    overlaps: Optional[Iterable[List[Tuple[int, int]]]] = None,
+) -> List[Dict]:
+    """
+    This function scores every record against the records it shares a similarity tag with and
+    keeps the ones that have at least one similar record. Records without common tags have
+    similarity 0, so the result is the same as scoring against all records.
+
+    Records are scored in order, as in _calculate_similarity: once a record finds a similar
+    record, its tags are extended with the tags of that record, including the ones it gathered
+    itself, and the extended tags count as the record's tags in all later comparisons. The
+    extended tags are kept next to the corpus instead of in the records.
+
+    Args:
+        corpus (EncodedCorpus): The encoded records.
+        min_similarity (float): The minimum similarity threshold for clustering.
+        clustering_logs (list, optional): Logs for the clustering process. Defaults to None.
+        overlaps (Iterable[List[Tuple[int, int]]], optional): Rows sharing similarity tags with
+            every row and the numbers of shared tags, see EncodedCorpus.overlaps. Defaults to
+            computing them in the current process.
+
+    Returns:
+        List[Dict]: Records with their 'id', non-empty 'similarity' list and 'all_tags' codes,
+        the input of _clean_up_first_iteration.
+    """
+    if overlaps is None:
+        overlaps = corpus.overlaps()
+    all_tags = {}
+    summary = []
+    for row, row_overlaps in enumerate(overlaps):
+        similarity = []
+        for other_row, common_count in row_overlaps:
+            if other_row == row:
+                continue
+            row_tags = all_tags.get(row)
+            other_tags = all_tags.get(other_row)
+            smaller_count = min(
+                corpus.row_length(row) if row_tags is None else len(row_tags),
+                corpus.row_length(other_row) if other_tags is None else len(other_tags),
+            )
+            similarity_percent = common_count / smaller_count
+            if clustering_logs:
+                clustering_logs.append(similarity_percent)
+            if similarity_percent > min_similarity:
+                if row_tags is None:
+                    row_tags = all_tags[row] = set(corpus.row(row))
+                row_tags.update(
+                    corpus.row(other_row) if other_tags is None else other_tags
+                )
+                similarity.append((corpus.ids[other_row], similarity_percent))
+        if similarity:
+            summary.append(
+                {
+                    "id": corpus.ids[row],
+                    "similarity": sorted(similarity, key=lambda x: x[1]),
+                    "all_tags": all_tags[row],
+                }
+            )
+    return summary
+
+
 def _clean_up_first_iteration(summary: List[Dict]) -> List[Dict]:
     """
     Cleans up the first iteration of the clustering process.
@@ -90,16 +156,17 @@ def _clean_up_first_iteration(summary: List[Dict]) -> List[Dict]:
         cluster_elements_ids = []
         first_element_id = s["id"]
         cluster_elements_ids.append(first_element_id)
-        elements_ids = [x for x in s["similarity"]]
-        for element_id in elements_ids:
-            present_element_ids = [x for x in cluster_elements_ids]
-            if element_id[0] not in present_element_ids:
+        for element_id in s["similarity"]:
+            if element_id[0] != first_element_id:
                 cluster_elements_ids.append(tuple(element_id))
         all_tags = s["all_tags"]
         cluster["for_finding_duplicates"] = set([x for x in cluster_elements_ids])
         cluster["id"] = cluster_id
         cluster_id += 1
-        cluster["all_elements"] = cluster_elements_ids
+        cluster["order_size"] = len(cluster_elements_ids)
+        cluster["members"] = _union_members(
+            (first_element_id,), sorted(x[0] for x in s["similarity"])
+        )
         cluster["all_tags"] = set(all_tags)
         clusters.append(cluster)
     return clusters
@@ -258,16 +325,10 @@ def _get_iteration_of_empty_clusters(
     if untouched_empty_similarity:
         for cluster in untouched_empty_similarity:
             cluster_elements = [x for x in similars if x["id"] == cluster][0]
-            cluster_elements = cluster_elements["all_elements"]
-
-            for i in range(len(cluster_elements)):
-                if isinstance(cluster_elements[i], tuple):
-                    cluster_elements[i] = cluster_elements[i][0]
-
-            cluster_elements = set(cluster_elements)
+            cluster_elements = cluster_elements["members"]
 
             if len(cluster_elements) >= min_elements_in_cluster:
-                result.append(tuple(sorted(cluster_elements)))
+                result.append(cluster_elements)
     return result
 
 
@@ -288,7 +349,9 @@ def _get_cluster(cluster_id: int, clusters: List[Dict]) -> Dict:
 
 def _merge_pairs(cluster_1: Dict, cluster_2: Dict, new_cluster_id: int) -> Dict:
     """
-    This function merges two clusters into a new cluster.
+    This function merges two clusters into a new cluster. The 'order_size' of the new cluster,
+    which orders clusters before every similarity round, is the sum of the order sizes of both
+    clusters less the number of members they share.
 
     Args:
         cluster_1 (Dict): The first cluster to be merged.
@@ -298,22 +361,49 @@ def _merge_pairs(cluster_1: Dict, cluster_2: Dict, new_cluster_id: int) -> Dict:
     Returns:
         Dict: The new merged cluster.
     """
-    all_elements = []
-    all_elements.extend(cluster_1["all_elements"])
-    all_elements.extend(cluster_2["all_elements"])
-    all_elements_temp = []
-    for element in all_elements:
-        if element in all_elements_temp:
-            continue
-        all_elements_temp.append(element)
-    all_elements = all_elements_temp
+    members = _union_members(cluster_1["members"], cluster_2["members"])
+    shared = len(cluster_1["members"]) + len(cluster_2["members"]) - len(members)
     all_tags = []
     all_tags.extend(cluster_1["all_tags"])
     all_tags.extend(cluster_2["all_tags"])
     all_tags = set(all_tags)
     new_cluster = {
         "id": new_cluster_id,
-        "all_elements": all_elements,
+        "order_size": cluster_1["order_size"] + cluster_2["order_size"] - shared,
+        "members": members,
         "all_tags": all_tags,
     }
     return new_cluster
+
+
+def _union_members(members_1: Sequence[int], members_2: Sequence[int]) -> Tuple[int, ...]:
+    """
+    This function merges two sorted sequences of record ids into one sorted tuple without
+    duplicates, in a single pass over both.
+
+    Args:
+        members_1 (Sequence[int]): Sorted record ids.
+        members_2 (Sequence[int]): Sorted record ids.
+
+    Returns:
+        Tuple[int, ...]: The sorted union of the record ids.
+    """
+    merged = []
+    i, j = 0, 0
+    while i < len(members_1) and j < len(members_2):
+        if members_1[i] < members_2[j]:
+            member = members_1[i]
+            i += 1
+        elif members_2[j] < members_1[i]:
+            member = members_2[j]
+            j += 1
+        else:
+            member = members_1[i]
+            i += 1
+            j += 1
+        if not merged or merged[-1] != member:
+            merged.append(member)
+    for member in list(members_1[i:]) + list(members_2[j:]):
+        if not merged or merged[-1] != member:
+            merged.append(member)
+    return tuple(merged)
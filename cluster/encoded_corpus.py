@@ -0,0 +1,122 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterator, List, Tuple
+
+ID_FORMAT = "q"
+OFFSET_FORMAT = "q"
+CODE_FORMAT = "i"
+
+
+class EncodedCorpus:
+    """
+    The records taking part in clustering, stored in flat arrays instead of a dict per record.
+
+    Every distinct tag of the data gets an int32 code. Tags occurring more than once in the
+    data (the similarity tags) are numbered first, in order of first occurrence, followed by
+    all other tags. A row holds the sorted codes of the distinct tags of its record, so its
+    similarity tags are the first `similarity_lengths[i]` codes and the number of tags used
+    as the denominator of similarity is the length of the row. Records without similarity
+    tags are left out, `ids` maps rows to positions in the input data.
+    """
+
+    def __init__(
+        self,
+        ids: array,
+        offsets: array,
+        codes: array,
+        similarity_lengths: array,
+        similarity_tags: int,
+    ):
+        """
+        Args:
+            ids (array): Position of the record of every row in the input data.
+            offsets (array): Row i spans codes[offsets[i]:offsets[i + 1]].
+            codes (array): Sorted tag codes of all rows, one after another.
+            similarity_lengths (array): Number of similarity tags of every row.
+            similarity_tags (int): Number of similarity tags, which have codes below it.
+        """
+        self.ids = ids
+        self.offsets = offsets
+        self.codes = codes
+        self.similarity_lengths = similarity_lengths
+        self.similarity_tags = similarity_tags
+
+    @classmethod
+    def encode(cls, data: list) -> "EncodedCorpus":
+        """
+        This function encodes the rows of tags of the data. The data is not modified.
+
+        Args:
+            data (list): Rows of hashable tags.
+
+        Returns:
+            EncodedCorpus: The encoded records.
+        """
+        tag_counts = {}
+        for row in data:
+            for tag in row:
+                tag_counts[tag] = tag_counts.get(tag, 0) + 1
+        vocabulary = {}
+        for tag, count in tag_counts.items():
+            if count > 1:
+                vocabulary[tag] = len(vocabulary)
+        similarity_tags = len(vocabulary)
+        for tag, count in tag_counts.items():
+            if count == 1:
+                vocabulary[tag] = len(vocabulary)
+        del tag_counts
+
+        ids = array(ID_FORMAT)
+        offsets = array(OFFSET_FORMAT, [0])
+        codes = array(CODE_FORMAT)
+        similarity_lengths = array(CODE_FORMAT)
+        for i, row in enumerate(data):
+            row_codes = sorted(set(vocabulary[x] for x in row))
+            similarity_length = bisect_left(row_codes, similarity_tags)
+            if similarity_length == 0:
+                continue
+            ids.append(i)
+            codes.extend(row_codes)
+            offsets.append(len(codes))
+            similarity_lengths.append(similarity_length)
+        return cls(ids, offsets, codes, similarity_lengths, similarity_tags)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def row(self, index: int) -> array:
+        return self.codes[self.offsets[index] : self.offsets[index + 1]]
+
+    def row_length(self, index: int) -> int:
+        return self.offsets[index + 1] - self.offsets[index]
+
+    def similarity_codes(self, index: int) -> array:
+        start = self.offsets[index]
+        return self.codes[start : start + self.similarity_lengths[index]]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            len(x) * x.itemsize
+            for x in (self.ids, self.offsets, self.codes, self.similarity_lengths)
+        )
+
+    def overlaps(self) -> Iterator[List[Tuple[int, int]]]:
+        """
+        This function lists, for every row, the rows sharing at least one similarity tag with
+        it and the number of shared tags, found through per-tag postings.
+
+        Yields:
+            List[Tuple[int, int]]: Rows and numbers of shared tags, in row order. The row itself
+            is included.
+        """
+        postings = [[] for _ in range(self.similarity_tags)]
+        for row in range(len(self)):
+            for code in self.similarity_codes(row):
+                postings[code].append(row)
+        for row in range(len(self)):
+            counts = {}
+            for code in self.similarity_codes(row):
+                for other_row in postings[code]:
+                    counts[other_row] = counts.get(other_row, 0) + 1
+            yield sorted(counts.items())
@@ -0,0 +1,225 @@
+import random
+from typing import Dict, List, Optional, Union
+
+from cluster.clustering_loop import _clustering_loop, _first_iteration_of_algo
+from cluster.encoded_corpus import EncodedCorpus
+from cluster.engines import ClusteringEngine, ReferenceEngine, _get_engine
+from cluster.prepare_data import _prepare_data
+
+
+def verify_engine(
+    engine: Union[str, ClusteringEngine],
+    datasets: Optional[List[list]] = None,
+    random_datasets: int = 5,
+    min_elements_in_cluster: int = 3,
+    min_similarity_first_iter: float = 0.5,
+    min_similarity_next_iters: float = None,
+    workers: int = 1,
+    seed: int = 0,
+) -> Dict:
+    """
+    This function runs an engine and the reference engine side by side on the same input and
+    reports the first step where their results differ. Results have to be identical, including
+    the order of similarity lists and floating point similarities.
+
+    Args:
+        engine (str or ClusteringEngine): The engine to verify, or its name in ENGINES.
+        datasets (List[list], optional): Datasets to verify on, e.g. dataset/sample_dataset.p.
+        random_datasets (int, optional): Number of randomized datasets verified after `datasets`. Defaults to 5.
+        min_elements_in_cluster (int, optional): The minimum number of elements in a cluster. Defaults to 3.
+        min_similarity_first_iter (float, optional): The minimum similarity for the first iteration. Defaults to 0.5.
+        min_similarity_next_iters (float, optional): The minimum similarity for the next iterations. Defaults to min_similarity_first_iter.
+        workers (int, optional): Number of worker processes if the engine is given by name. Defaults to 1.
+        seed (int, optional): Seed of the randomized datasets. Defaults to 0.
+
+    Returns:
+        Dict: 'equivalent', number of 'datasets' verified and the first 'divergence', which is None
+        or a dict with the 'dataset' index, 'step', merge 'round', 'index' of the first differing
+        element and the 'reference' and 'engine' values of that element.
+    """
+    if not min_similarity_next_iters:
+        min_similarity_next_iters = min_similarity_first_iter
+    datasets = list(datasets or [])
+    datasets.extend(_random_datasets(random_datasets, seed))
+    params = (min_elements_in_cluster, min_similarity_first_iter, min_similarity_next_iters)
+
+    engine, owned_engine = _get_engine(engine, workers)
+    try:
+        for index, dataset in enumerate(datasets):
+            reference_trace = _trace(ReferenceEngine(), dataset, *params)
+            engine_trace = _trace(engine, dataset, *params)
+            divergence = _first_divergence(reference_trace, engine_trace)
+            if divergence is not None:
+                divergence["dataset"] = index
+                return {
+                    "equivalent": False,
+                    "datasets": index + 1,
+                    "divergence": divergence,
+                }
+    finally:
+        if owned_engine:
+            engine.close()
+    return {"equivalent": True, "datasets": len(datasets), "divergence": None}
+
+
+class _RecordingEngine:
+    """
+    Wraps an engine and records the result of every step, in the order of the clustering loop.
+    """
+
+    def __init__(self, engine: ClusteringEngine):
+        self.engine = engine
+        self.trace = []
+        self.round = 0
+
+    def first_iteration_summary(
+        self, corpus: EncodedCorpus, min_similarity: float, clustering_logs=None
+    ) -> List[Dict]:
+        summary = self.engine.first_iteration_summary(
+            corpus, min_similarity, clustering_logs
+        )
+        self._record(
+            "record similarity lists",
+            [(x["id"], list(x["similarity"]), set(x["all_tags"])) for x in summary],
+        )
+        return summary
+
+    def similarity_against_all(
+        self, clusters: List[Dict], min_similarity: float, clustering_logs=None
+    ) -> List[Dict]:
+        similars = self.engine.similarity_against_all(
+            clusters, min_similarity, clustering_logs
+        )
+        self._record(
+            "cluster similarity lists",
+            [
+                (x["id"], [(y["id"], y["similarity_percent"]) for y in x["similarity"]])
+                for x in similars
+            ],
+        )
+        return similars
+
+    def merge_algo(self, clusters: List[Dict], similars: List[Dict]):
+        result = self.engine.merge_algo(clusters, similars)
+        self._record("pairs to merge", list(result[2]))
+        self.round += 1
+        return result
+
+    def merge_pairs(self, cluster_1: Dict, cluster_2: Dict, new_cluster_id: int) -> Dict:
+        new_cluster = self.engine.merge_pairs(cluster_1, cluster_2, new_cluster_id)
+        self._record(
+            "merged clusters",
+            [
+                (
+                    new_cluster["id"],
+                    new_cluster["order_size"],
+                    new_cluster["members"],
+                    set(new_cluster["all_tags"]),
+                )
+            ],
+        )
+        return new_cluster
+
+    def close(self) -> None:
+        self.engine.close()
+
+    def _record(self, step: str, values: list) -> None:
+        self.trace.append((step, self.round, values))
+
+
+def _trace(
+    engine: ClusteringEngine,
+    dataset: list,
+    min_elements_in_cluster: int,
+    min_similarity_first_iter: float,
+    min_similarity_next_iters: float,
+) -> list:
+    recording_engine = _RecordingEngine(engine)
+    corpus = _prepare_data(dataset)
+    (
+        empty_similarity_clusters,
+        pairs_to_merge,
+        previous_clusters,
+    ) = _first_iteration_of_algo(
+        corpus,
+        min_similarity_first_iter,
+        min_elements_in_cluster=min_elements_in_cluster,
+        engine=recording_engine,
+    )
+    final_clusters = _clustering_loop(
+        empty_similarity_clusters,
+        pairs_to_merge,
+        previous_clusters,
+        min_similarity=min_similarity_next_iters,
+        min_elements_in_cluster=min_elements_in_cluster,
+        engine=recording_engine,
+    )
+    recording_engine._record("final clusters", final_clusters)
+    return recording_engine.trace
+
+
+def _first_divergence(reference_trace: list, engine_trace: list) -> Optional[Dict]:
+    """
+    This function compares two traces step by step.
+
+    Returns:
+        Optional[Dict]: The first difference, or None if the traces are identical.
+    """
+    for position in range(max(len(reference_trace), len(engine_trace))):
+        reference_step = _step_at(reference_trace, position)
+        engine_step = _step_at(engine_trace, position)
+        if reference_step == engine_step:
+            continue
+        step, round, reference_values = reference_step
+        if reference_step[:2] != engine_step[:2]:
+            return {
+                "step": step if step is not None else engine_step[0],
+                "round": round if round is not None else engine_step[1],
+                "index": None,
+                "reference": reference_step[:2],
+                "engine": engine_step[:2],
+            }
+        engine_values = engine_step[2]
+        for index in range(max(len(reference_values), len(engine_values))):
+            reference_value = _value_at(reference_values, index)
+            engine_value = _value_at(engine_values, index)
+            if reference_value != engine_value:
+                return {
+                    "step": step,
+                    "round": round,
+                    "index": index,
+                    "reference": reference_value,
+                    "engine": engine_value,
+                }
+    return None
+
+
+def _step_at(trace: list, position: int) -> tuple:
+    return trace[position] if position < len(trace) else (None, None, [])
+
+
+def _value_at(values: list, index: int):
+    return values[index] if index < len(values) else None
+
+
+def _random_datasets(count: int, seed: int, size: int = 200) -> List[list]:
+    """
+    This function generates datasets of records drawn from a few overlapping topics, with noise
+    tags, so that clustering runs several merge rounds.
+    """
+    rng = random.Random(seed)
+    datasets = []
+    for _ in range(count):
+        vocabulary = rng.randint(30, 80)
+        topics = [
+            [f"tag{rng.randrange(vocabulary)}" for _ in range(rng.randint(4, 10))]
+            for _ in range(rng.randint(3, 12))
+        ]
+        dataset = []
+        for _ in range(size):
+            topic = rng.choice(topics)
+            tags = rng.sample(topic, rng.randint(1, len(topic)))
+            tags += [f"noise{rng.randrange(size * 5)}" for _ in range(rng.randint(0, 4))]
+            dataset.append(tags)
+        datasets.append(dataset)
+    return datasets
@@ -0,0 +1,167 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from typing import Dict, List, Optional, Protocol, Tuple, Union
+
+from cluster.clustering_utils import (
+    _first_iteration_summary,
+    _merge_algo,
+    _merge_pairs,
+    _similarity_agains_all,
+)
+from cluster.encoded_corpus import EncodedCorpus
+from cluster.parallel_scoring import _parallel_overlaps, _parallel_similarity_agains_all
+
+
+class ClusteringEngine(Protocol):
+    """
+    The similarity and merge steps of the clustering loop. Every method has to return the same
+    result as the matching function in clustering_utils.py, which verify_engine checks.
+    """
+
+    def first_iteration_summary(
+        self,
+        corpus: EncodedCorpus,
+        min_similarity: float,
+        clustering_logs: Optional[list] = None,
+    ) -> List[Dict]:
+        """See _first_iteration_summary."""
+
+    def similarity_against_all(
+        self,
+        clusters: List[Dict],
+        min_similarity: float,
+        clustering_logs: Optional[List] = None,
+    ) -> List[Dict]:
+        """See _similarity_agains_all."""
+
+    def merge_algo(
+        self, clusters: List[Dict], similars: List[Dict]
+    ) -> Tuple[List[int], List[int], List[Tuple[int, int]]]:
+        """See _merge_algo."""
+
+    def merge_pairs(self, cluster_1: Dict, cluster_2: Dict, new_cluster_id: int) -> Dict:
+        """See _merge_pairs."""
+
+    def close(self) -> None:
+        """Releases resources held by the engine."""
+
+
+class ReferenceEngine:
+    """
+    The pure-Python implementation from clustering_utils.py, running in the current process.
+    """
+
+    name = "reference"
+
+    def first_iteration_summary(
+        self,
+        corpus: EncodedCorpus,
+        min_similarity: float,
+        clustering_logs: Optional[list] = None,
+    ) -> List[Dict]:
+        return _first_iteration_summary(corpus, min_similarity, clustering_logs)
+
+    def similarity_against_all(
+        self,
+        clusters: List[Dict],
+        min_similarity: float,
+        clustering_logs: Optional[List] = None,
+    ) -> List[Dict]:
+        return _similarity_agains_all(clusters, min_similarity, clustering_logs)
+
+    def merge_algo(
+        self, clusters: List[Dict], similars: List[Dict]
+    ) -> Tuple[List[int], List[int], List[Tuple[int, int]]]:
+        return _merge_algo(clusters, similars)
+
+    def merge_pairs(self, cluster_1: Dict, cluster_2: Dict, new_cluster_id: int) -> Dict:
+        return _merge_pairs(cluster_1, cluster_2, new_cluster_id)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class ProcessPoolEngine(ReferenceEngine):
+    """
+    Runs the scoring loops in a process pool, with the encoded corpus in shared memory.
+    Workers count the tags shared by records in the first iteration, which is then scored in
+    the current process, and compute cluster similarities. Merge steps are the reference ones.
+    """
+
+    name = "process_pool"
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Start the workers before any shared memory block exists: forked later, they would
+        # inherit the mappings of the blocks of that time and keep them for their lifetime.
+        # The resource tracker is started first, so that the workers share it with this
+        # process instead of starting their own, see _attach_block.
+        resource_tracker.ensure_running()
+        self.executor.submit(os.getpid).result()
+
+    def first_iteration_summary(
+        self,
+        corpus: EncodedCorpus,
+        min_similarity: float,
+        clustering_logs: Optional[list] = None,
+    ) -> List[Dict]:
+        overlaps = _parallel_overlaps(corpus, self.executor, self.workers)
+        return _first_iteration_summary(
+            corpus, min_similarity, clustering_logs, overlaps=overlaps
+        )
+
+    def similarity_against_all(
+        self,
+        clusters: List[Dict],
+        min_similarity: float,
+        clustering_logs: Optional[List] = None,
+    ) -> List[Dict]:
+        return _parallel_similarity_agains_all(
+            clusters, min_similarity, self.executor, self.workers, clustering_logs
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+
+ENGINES = {x.name: x for x in (ReferenceEngine, ProcessPoolEngine)}
+
+
+def _get_engine(
+    engine: Union[None, str, ClusteringEngine], workers: int
+) -> Tuple[ClusteringEngine, bool]:
+    """
+    This function resolves the engine argument of cluster().
+
+    Args:
+        engine (None, str or ClusteringEngine): An engine, a name from ENGINES, or None to pick
+            the engine based on the number of workers.
+        workers (int): Number of worker processes for engines created here.
+
+    Returns:
+        Tuple[ClusteringEngine, bool]: The engine and whether it was created here and has to be
+        closed by the caller.
+    """
+    if engine is None:
+        engine = ProcessPoolEngine.name if workers > 1 else ReferenceEngine.name
+    if not isinstance(engine, str):
+        return engine, False
+    if engine not in ENGINES:
+        raise ValueError(
+            f"Unknown engine {engine!r}, available engines: {', '.join(ENGINES)}"
+        )
+    if engine == ProcessPoolEngine.name:
+        return ProcessPoolEngine(workers if workers > 1 else None), True
+    return ENGINES[engine](), True
@@ -0,0 +1,188 @@
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from cluster.encoded_corpus import EncodedCorpus
+from cluster.shared_corpus import SharedCorpus, _attached_corpus
+
+TASKS_PER_WORKER = 4
+
+
+def _parallel_overlaps(
+    corpus: EncodedCorpus, executor: Executor, workers: int
+) -> List[List[Tuple[int, int]]]:
+    """
+    This function finds, for every row of the corpus, the rows sharing at least one similarity
+    tag with it and the number of shared tags, like EncodedCorpus.overlaps. The similarity tag
+    codes are placed in shared memory and workers search them through an inverted index, so a
+    task only carries a row range.
+
+    Args:
+        corpus (EncodedCorpus): The encoded records.
+        executor (Executor): Process pool running the workers.
+        workers (int): Number of worker processes of the executor.
+
+    Returns:
+        List[List[Tuple[int, int]]]: Overlapping rows and numbers of shared tags of every row.
+    """
+    rows = (corpus.similarity_codes(x) for x in range(len(corpus)))
+    with SharedCorpus.create(rows) as shared_corpus:
+        results = _map_row_ranges(
+            executor, _overlapping_rows, shared_corpus, workers
+        )
+    return [x for result in results for x in result]
+
+
+def _parallel_similarity_agains_all(
+    clusters: List[Dict],
+    min_similarity: float,
+    executor: Executor,
+    workers: int,
+    clustering_logs: Optional[List] = None,
+) -> List[Dict]:
+    """
+    This function is the multi-process counterpart of _similarity_agains_all. Tags of the
+    clusters are encoded to ints and placed in shared memory, workers score row ranges of
+    clusters against all clusters.
+
+    Args:
+        clusters (List[Dict]): List of clusters to compare.
+        min_similarity (float): Minimum similarity threshold.
+        executor (Executor): Process pool running the workers.
+        workers (int): Number of worker processes of the executor.
+        clustering_logs (Optional[List]): Optional list to store clustering logs.
+
+    Returns:
+        List[Dict]: List of clusters with updated similarity information.
+    """
+    vocabulary = {}
+    rows = []
+    for cluster in clusters:
+        rows.append(
+            sorted(vocabulary.setdefault(x, len(vocabulary)) for x in cluster["all_tags"])
+        )
+    with SharedCorpus.create(rows) as corpus:
+        results = _map_row_ranges(
+            executor,
+            _score_rows,
+            corpus,
+            workers,
+            min_similarity,
+            clustering_logs is not None,
+        )
+
+    row = 0
+    for similarities, logs in results:
+        for similarity in similarities:
+            clusters[row]["similarity"] = [
+                {"id": clusters[x]["id"], "similarity_percent": y} for x, y in similarity
+            ]
+            row += 1
+        if clustering_logs is not None:
+            clustering_logs.extend(logs)
+    for cluster in clusters:
+        del cluster["all_tags"]
+    return clusters
+
+
+def _map_row_ranges(
+    executor: Executor, function, corpus: SharedCorpus, workers: int, *args
+) -> list:
+    """
+    This function splits the rows of the corpus into ranges and runs `function` on each of
+    them in the executor. Tasks only carry the names of the shared memory blocks, the row
+    range and the remaining arguments.
+
+    Returns:
+        list: Results of the tasks, in row order.
+    """
+    rows = len(corpus)
+    tasks = max(1, min(rows, workers * TASKS_PER_WORKER))
+    bounds = [rows * i // tasks for i in range(tasks + 1)]
+    futures = [
+        executor.submit(function, corpus.names, corpus.shape, start, stop, *args)
+        for start, stop in zip(bounds, bounds[1:])
+    ]
+    try:
+        return [x.result() for x in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+
+def _inverted_index(corpus: SharedCorpus, cache: dict) -> Dict[int, List[int]]:
+    """
+    This function maps every tag code to the rows containing it. It is built once per corpus
+    in each worker.
+    """
+    if "inverted_index" not in cache:
+        inverted_index = {}
+        for row in range(len(corpus)):
+            for code in corpus.row(row):
+                inverted_index.setdefault(code, []).append(row)
+        cache["inverted_index"] = inverted_index
+    return cache["inverted_index"]
+
+
+def _overlap_counts(
+    corpus: SharedCorpus, inverted_index: Dict[int, List[int]], row: int
+) -> Dict[int, int]:
+    counts = {}
+    for code in corpus.row(row):
+        for other_row in inverted_index[code]:
+            counts[other_row] = counts.get(other_row, 0) + 1
+    return counts
+
+
+def _overlapping_rows(
+    names: Tuple[str, str], shape: Tuple[int, int], start: int, stop: int
+) -> List[List[Tuple[int, int]]]:
+    """
+    This function runs in a worker and lists, for rows start..stop, the rows that have at least
+    one code in common with them and the number of common codes, in row order.
+    """
+    with _attached_corpus(names, shape) as (corpus, cache):
+        inverted_index = _inverted_index(corpus, cache)
+        return [
+            sorted(_overlap_counts(corpus, inverted_index, row).items())
+            for row in range(start, stop)
+        ]
+
+
+def _score_rows(
+    names: Tuple[str, str],
+    shape: Tuple[int, int],
+    start: int,
+    stop: int,
+    min_similarity: float,
+    collect_logs: bool,
+) -> Tuple[List[List[Tuple[int, float]]], List[float]]:
+    """
+    This function runs in a worker and scores rows start..stop against all other rows, the
+    same way _similarity_agains_all does: the number of common tags divided by the size of
+    the smaller cluster.
+
+    Returns:
+        Tuple[List[List[Tuple[int, float]]], List[float]]: Similar rows with similarity of every
+        row and the non-zero similarities, in the order _similarity_agains_all logs them.
+    """
+    with _attached_corpus(names, shape) as (corpus, cache):
+        inverted_index = _inverted_index(corpus, cache)
+        offsets = corpus.offsets
+        similarities = []
+        logs = []
+        for row in range(start, stop):
+            row_length = offsets[row + 1] - offsets[row]
+            counts = _overlap_counts(corpus, inverted_index, row)
+            similarity = []
+            for other_row in sorted(counts):
+                if other_row == row:
+                    continue
+                other_length = offsets[other_row + 1] - offsets[other_row]
+                similarity_percent = counts[other_row] / min(row_length, other_length)
+                if collect_logs:
+                    logs.append(similarity_percent)
+                if similarity_percent >= min_similarity:
+                    similarity.append((other_row, similarity_percent))
+            similarities.append(similarity)
+    return similarities, logs
@@ -1,5 +1,14 @@
+import sys
 import time
 from datetime import datetime
+from typing import Optional
+
+from cluster.encoded_corpus import EncodedCorpus
+
+try:
+    import resource
+except ImportError:
+    resource = None
 
 
 def _print_start_time() -> datetime:
@@ -26,6 +35,43 @@ def _print_end_time(start_time):
     print(f"Clustering completed in - {minutes}:{seconds}")
 
 
+def _log_phase(phase_log: Optional[list], phase: str, start_time: float) -> float:
+    """
+    This function appends the duration and peak memory of a phase of the clustering process to the log.
+
+    Args:
+        phase_log (list, optional): The log. Nothing is logged if it is None.
+        phase (str): Name of the phase.
+        start_time (float): Start time of the phase.
+
+    Returns:
+        float: The end time of the phase, which is the start time of the next one.
+    """
+    end_time = time.time()
+    if phase_log is not None:
+        phase_log.append(
+            {
+                "phase": phase,
+                "seconds": end_time - start_time,
+                "max_rss_mb": _max_rss_mb(),
+            }
+        )
+    return end_time
+
+
+def _max_rss_mb() -> Optional[float]:
+    """
+    This function returns the peak resident memory of the process in megabytes, or None on
+    platforms without the resource module.
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return max_rss / 1024 / 1024
+    return max_rss / 1024
+
+
 def _prepare_output(clusters: list, initial_data: list) -> list:
     """
     This function prepares the output by associating each cluster with its source data and row number.
@@ -45,7 +91,7 @@ def _prepare_output(clusters: list, initial_data: list) -> list:
     return clusters
 
 
-def _prepare_data(data: list) -> list:
+def _prepare_data(data: list) -> EncodedCorpus:
     """
     This function prepares the data for clustering.
 
@@ -54,71 +100,7 @@ def _prepare_data(data: list) -> list:
         The function will process this data for clustering, including encoding the tags for similarity comparison.
 
     Returns:
-        list: The prepared data, where each element is a dictionary containing an 'id' key
-        representing the index of the data in the original list, a 'tags' key containing the
-        original data, and a 'similarity_tags' key containing the encoded tags for similarity
-        comparison. The list only includes elements where 'similarity_tags' key exists.
-    """
-    for i in range(len(data)):
-        data[i] = {"id": i, "tags": data[i]}
-    all_tags_map = _create_tags_map(data)
-    all_tags_map = _encode_tags_map(all_tags_map)
-    data = _map_tags_to_simplified(data, all_tags_map)
-    data = [x for x in data if "similarity_tags" in x]
-    data = [_prepare_records(x) for x in data]
-    return data
-
-
-def _prepare_records(record: dict) -> dict:
-    """
-    This function prepares the record by converting the tags to a set.
-
-    Args:
-        record (dict): The record to be prepared.
-
-    Returns:
-        dict: The prepared record.
-    """
-    tags = set(record["tags"])
-    record["tags"] = tags
-    return record
-
-
-def _encode_tags_map(tags_map):
-    for index, key in enumerate(tags_map.keys()):
-        tags_map[key] = index
-    return tags_map
-
-
-def _map_tags_to_simplified(records, tags_map):
-    for record in records:
-        tags = record["tags"]
-        tags = [tags_map[x] for x in tags if x in tags_map]
-        if tags:
-            record["similarity_tags"] = set(tags)
-    return records
-
-
-def _create_tags_map(records: list) -> dict:
-    """
-    This function creates a map of tags from the records. Each tag is mapped to its frequency of occurrence
-    across all records. Only tags that occur more than once are included in the final map.
-
-    Args:
-        records (list): The list of records. Each record is a dictionary containing an 'id' key
-        representing the index of the record in the original list, a 'tags' key containing the
-        original tags, and a 'similarity_tags' key containing the encoded tags for similarity
-        comparison.
-
-    Returns:
-        dict: The map of tags. Each key is a tag, and its corresponding value is the frequency of
-        occurrence of that tag across all records. Only tags that occur more than once are included.
+        EncodedCorpus: The records that have at least one tag occurring more than once in the data,
+        with their tags encoded as integers. The data is not modified.
     """
-    tags_map = dict()
-    for record in records:
-        for tag in record["tags"]:
-            if tag not in tags_map:
-                tags_map[tag] = 1
-            else:
-                tags_map[tag] = tags_map[tag] + 1
-    return {k: v for k, v in tags_map.items() if v > 1}
+    return EncodedCorpus.encode(data)
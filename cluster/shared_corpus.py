@@ -0,0 +1,176 @@
+from array import array
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+OFFSET_FORMAT = "q"
+CODE_FORMAT = "i"
+
+
+class SharedCorpus:
+    """
+    Encoded records stored in shared memory as two flat arrays: tag codes of all rows one
+    after another and offsets, where row i spans codes[offsets[i]:offsets[i + 1]].
+
+    The process that creates the corpus owns the memory and has to unlink it, preferably by
+    using the corpus as a context manager. Worker processes attach read-only views by name.
+    """
+
+    def __init__(
+        self,
+        offsets_memory: shared_memory.SharedMemory,
+        codes_memory: shared_memory.SharedMemory,
+        rows: int,
+        codes: int,
+        owner: bool,
+    ):
+        self._offsets_memory = offsets_memory
+        self._codes_memory = codes_memory
+        self._owner = owner
+        self.offsets = _view(offsets_memory, OFFSET_FORMAT, rows + 1, readonly=not owner)
+        self.codes = _view(codes_memory, CODE_FORMAT, codes, readonly=not owner)
+
+    @classmethod
+    def create(cls, rows: List[Iterable[int]]) -> "SharedCorpus":
+        """
+        This function copies encoded rows into new shared memory blocks.
+
+        Args:
+            rows (List[Iterable[int]]): Tag codes of every row.
+
+        Returns:
+            SharedCorpus: The corpus, owned by the calling process.
+        """
+        offsets = array(OFFSET_FORMAT, [0])
+        codes = array(CODE_FORMAT)
+        for row in rows:
+            codes.extend(row)
+            offsets.append(len(codes))
+        offsets_memory = _allocate(offsets)
+        try:
+            codes_memory = _allocate(codes)
+        except BaseException:
+            offsets_memory.close()
+            offsets_memory.unlink()
+            raise
+        return cls(offsets_memory, codes_memory, len(offsets) - 1, len(codes), owner=True)
+
+    @classmethod
+    def attach(cls, names: Tuple[str, str], rows: int, codes: int) -> "SharedCorpus":
+        """
+        This function attaches read-only views to a corpus created in another process.
+
+        Args:
+            names (Tuple[str, str]): Names of the offsets and codes blocks, see SharedCorpus.names.
+            rows (int): Number of rows in the corpus.
+            codes (int): Number of tag codes in the corpus.
+
+        Returns:
+            SharedCorpus: The attached corpus. It has to be closed, but not unlinked.
+        """
+        offsets_memory = _attach_block(names[0])
+        codes_memory = _attach_block(names[1])
+        return cls(offsets_memory, codes_memory, rows, codes, owner=False)
+
+    @property
+    def names(self) -> Tuple[str, str]:
+        return self._offsets_memory.name, self._codes_memory.name
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """Number of rows and number of tag codes, needed to attach the corpus."""
+        return len(self), len(self.codes)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def row(self, index: int) -> memoryview:
+        return self.codes[self.offsets[index] : self.offsets[index + 1]]
+
+    def close(self) -> None:
+        """
+        This function releases the views and detaches the shared memory from this process.
+        """
+        for view in (self.offsets, self.codes):
+            view.release()
+        self._offsets_memory.close()
+        self._codes_memory.close()
+
+    def unlink(self) -> None:
+        """
+        This function frees the shared memory. Only the owner should call it.
+        """
+        for memory in (self._offsets_memory, self._codes_memory):
+            try:
+                memory.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self) -> "SharedCorpus":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+        if self._owner:
+            self.unlink()
+
+
+def _itemsize(format: str) -> int:
+    return array(format).itemsize
+
+
+def _allocate(values: array) -> shared_memory.SharedMemory:
+    size = len(values) * values.itemsize
+    memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    memory.buf[:size] = values.tobytes()
+    return memory
+
+
+def _attach_block(name: str) -> shared_memory.SharedMemory:
+    """
+    This function attaches an existing shared memory block. Workers are children of the owner
+    and share its resource tracker, so the owner unlinking the block also clears the tracker,
+    and a block left behind by a crashed owner is removed when the tracker exits.
+    """
+    return shared_memory.SharedMemory(name=name)
+
+
+def _view(
+    memory: shared_memory.SharedMemory, format: str, length: int, readonly: bool
+) -> memoryview:
+    view = memory.buf[: length * _itemsize(format)].cast(format)
+    if readonly:
+        readonly_view = view.toreadonly()
+        view.release()
+        return readonly_view
+    return view
+
+
+_derived: Optional[Tuple[Tuple[str, str], dict]] = None
+
+
+@contextmanager
+def _attached_corpus(
+    names: Tuple[str, str], shape: Tuple[int, int]
+) -> Iterator[Tuple[SharedCorpus, dict]]:
+    """
+    This function attaches the corpus in the current worker process for the duration of one
+    task, together with a dict for data derived from it, e.g. an inverted index. The corpus is
+    closed when the task ends, so a worker never keeps blocks mapped after the owner unlinks
+    them. Derived data is kept for the latest corpus, so the other tasks of a batch reuse it.
+
+    Args:
+        names (Tuple[str, str]): Names of the shared memory blocks.
+        shape (Tuple[int, int]): Number of rows and tag codes.
+
+    Yields:
+        Tuple[SharedCorpus, dict]: The corpus and the per-corpus cache.
+    """
+    global _derived
+    if _derived is None or _derived[0] != names:
+        _derived = (names, {})
+    corpus = SharedCorpus.attach(names, *shape)
+    try:
+        yield corpus, _derived[1]
+    finally:
+        corpus.close()
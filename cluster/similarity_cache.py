@@ -0,0 +1,218 @@
+import hashlib
+import os
+import struct
+import tempfile
+from array import array
+from typing import Callable, Dict, List, Optional
+
+from cluster.encoded_corpus import EncodedCorpus
+
+FORMAT_VERSION = b"CCSIM3"
+CHECKSUM_SIZE = 32
+FILE_SUFFIX = ".sim"
+DEFAULT_MAX_BYTES = 1024**3
+
+
+class SimilarityCache:
+    """
+    On-disk cache of first iteration similarity lists (the input of _clean_up_first_iteration).
+
+    Entries are keyed by a fingerprint of the encoded records and the first iteration
+    threshold, so reclustering the same data with other next iteration parameters skips the
+    first iteration scoring. Files are evicted least recently used first once the directory
+    grows over `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (str): Directory for the cache files, created if it does not exist.
+            max_bytes (int, optional): Maximum total size of the cache files. Defaults to 1 GiB.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def first_iteration_summary(
+        self,
+        corpus: EncodedCorpus,
+        min_similarity: float,
+        compute: Callable[[], List[Dict]],
+    ) -> List[Dict]:
+        """
+        This function returns the cached first iteration summary of the records, or computes
+        and stores it.
+
+        Args:
+            corpus (EncodedCorpus): The encoded records.
+            min_similarity (float): The first iteration threshold.
+            compute (Callable[[], List[Dict]]): Computes the summary on a cache miss.
+
+        Returns:
+            List[Dict]: Records with their 'id', 'similarity' and 'all_tags'.
+        """
+        key = _fingerprint(corpus, min_similarity)
+        path = os.path.join(self.directory, key + FILE_SUFFIX)
+        summary = self._load(path)
+        if summary is not None:
+            return summary
+        summary = compute()
+        self._store(path, summary)
+        return summary
+
+    def _load(self, path: str) -> Optional[List[Dict]]:
+        try:
+            with open(path, "rb") as file:
+                content = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            summary = _decode_summary(content)
+        except (ValueError, IndexError, struct.error):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return summary
+
+    def _store(self, path: str, summary: List[Dict]) -> None:
+        """
+        This function writes the summary to the cache. Storing is best-effort: when the
+        directory cannot be written, e.g. the disk is full, the summary is just not cached.
+        """
+        content = _encode_summary(summary)
+        try:
+            file_descriptor, temporary_path = tempfile.mkstemp(
+                dir=self.directory, suffix=".tmp"
+            )
+        except OSError:
+            return
+        try:
+            with os.fdopen(file_descriptor, "wb") as file:
+                file.write(content)
+            os.replace(temporary_path, path)
+        except BaseException as error:
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+            if isinstance(error, OSError):
+                return
+            raise
+        try:
+            self._evict()
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """
+        This function removes the least recently used files until the cache fits in max_bytes.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(FILE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(x[1] for x in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def _fingerprint(corpus: EncodedCorpus, min_similarity: float) -> str:
+    """
+    This function hashes the arrays of the encoded records and the threshold. Summaries only
+    depend on the tag codes, so data encoded to the same arrays shares a cache entry.
+
+    Args:
+        corpus (EncodedCorpus): The encoded records.
+        min_similarity (float): The first iteration threshold.
+
+    Returns:
+        str: The key.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(FORMAT_VERSION)
+    digest.update(repr((min_similarity, corpus.similarity_tags)).encode())
+    for values in (corpus.ids, corpus.offsets, corpus.codes, corpus.similarity_lengths):
+        digest.update(struct.pack("<Q", len(values)))
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+def _encode_summary(summary: List[Dict]) -> bytes:
+    """
+    This function packs the summary into flat arrays: record ids, offsets into the similar
+    record ids and similarities, and offsets into the 'all_tags' codes. The arrays are preceded
+    by a blake2b checksum, so a corrupted file is recomputed instead of read as another summary.
+    """
+    ids = array("q")
+    similarity_offsets = array("q", [0])
+    similar_ids = array("q")
+    similarities = array("d")
+    tag_offsets = array("q", [0])
+    tag_codes = array("i")
+    for record in summary:
+        ids.append(record["id"])
+        for similar_id, similarity in record["similarity"]:
+            similar_ids.append(similar_id)
+            similarities.append(similarity)
+        similarity_offsets.append(len(similar_ids))
+        tag_codes.extend(record["all_tags"])
+        tag_offsets.append(len(tag_codes))
+
+    parts = []
+    for values in (ids, similarity_offsets, similar_ids, similarities, tag_offsets, tag_codes):
+        parts.append(struct.pack("<Q", len(values)))
+        parts.append(values.tobytes())
+    payload = b"".join(parts)
+    checksum = hashlib.blake2b(payload, digest_size=CHECKSUM_SIZE).digest()
+    return FORMAT_VERSION + checksum + payload
+
+
+def _decode_summary(content: bytes) -> List[Dict]:
+    if not content.startswith(FORMAT_VERSION):
+        raise ValueError("Unknown cache file format")
+    position = len(FORMAT_VERSION) + CHECKSUM_SIZE
+    checksum = content[len(FORMAT_VERSION) : position]
+    if hashlib.blake2b(content[position:], digest_size=CHECKSUM_SIZE).digest() != checksum:
+        raise ValueError("Corrupted cache file")
+    arrays = []
+    for typecode in ("q", "q", "q", "d", "q", "i"):
+        (length,) = struct.unpack_from("<Q", content, position)
+        position += 8
+        values = array(typecode)
+        end = position + length * values.itemsize
+        if end > len(content):
+            raise ValueError("Truncated cache file")
+        values.frombytes(content[position:end])
+        position = end
+        arrays.append(values)
+    ids, similarity_offsets, similar_ids, similarities, tag_offsets, tag_codes = arrays
+
+    summary = []
+    for i, record_id in enumerate(ids):
+        start, end = similarity_offsets[i], similarity_offsets[i + 1]
+        summary.append(
+            {
+                "id": record_id,
+                "similarity": list(zip(similar_ids[start:end], similarities[start:end])),
+                "all_tags": set(tag_codes[tag_offsets[i] : tag_offsets[i + 1]]),
+            }
+        )
+    return summary
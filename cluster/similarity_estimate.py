@@ -0,0 +1,127 @@
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+from cluster.arrow_input import _encode_list_column, _is_list_column
+from cluster.prepare_data import _prepare_data
+
+
+def estimate_similarity_distribution(
+    data: list,
+    sample_pairs: int = 10000,
+    bins: int = 100,
+    thresholds: Optional[List[float]] = None,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> Dict:
+    """
+    This function estimates the distribution of record similarities without a full quadratic run,
+    e.g. to pick `min_similarity_first_iter` and to estimate the cost of clustering.
+
+    Records are encoded the same way as in cluster() and similarity is the overlap coefficient of
+    _calculate_similarity: common tags divided by the number of tags of the smaller record. Pairs
+    that share no tag have similarity 0 and are counted exactly. Pairs sharing tags are sampled
+    through the postings of shared tags: a tag is drawn with probability proportional to the
+    number of pairs in its postings, then a pair of its records. Each sample is weighted by the
+    inverse of the number of tags the pair shares, so the estimates are unbiased and pairs with
+    non-zero similarity are never starved by the zero ones.
+
+    The estimate is for each unordered pair of records compared once with their own tags; the
+    first iteration of cluster() compares pairs in both directions and grows the tags of records
+    as they find similar ones.
+
+    Args:
+        data (list): The data to be clustered, in any format accepted by cluster().
+        sample_pairs (int, optional): Number of sampled pairs. Defaults to 10000.
+        bins (int, optional): Number of equal histogram bins over [0, 1]. Defaults to 100.
+        thresholds (List[float], optional): Thresholds to predict pair counts for. Defaults to
+            0.05, 0.1, ..., 0.95.
+        confidence (float, optional): Confidence level of the bounds. Defaults to 0.95.
+        seed (int, optional): Seed of the random generator.
+
+    Returns:
+        Dict: 'records' - number of records taking part in clustering, 'total_pairs' - number of
+        unordered record pairs, 'sharing_pairs' - estimated pairs sharing at least one tag,
+        'bin_edges' and 'histogram' - estimated number of pairs with non-zero similarity in every
+        bin, 'thresholds' and 'pairs_above' - estimated number of pairs with similarity greater
+        than every threshold, i.e. candidate pairs of the first iteration. Every estimate is a
+        dict with 'estimate', 'lower' and 'upper'.
+    """
+    if thresholds is None:
+        thresholds = [round(0.05 * x, 2) for x in range(1, 20)]
+
+    if _is_list_column(data):
+        corpus, _ = _encode_list_column(data)
+    else:
+        corpus = _prepare_data(data)
+
+    postings = [[] for _ in range(corpus.similarity_tags)]
+    for row in range(len(corpus)):
+        for code in corpus.similarity_codes(row):
+            postings[code].append(row)
+    postings = [x for x in postings if len(x) > 1]
+    tag_pairs = [len(x) * (len(x) - 1) // 2 for x in postings]
+    total_tag_pairs = sum(tag_pairs)
+
+    rng = random.Random(seed)
+    samples = []
+    if total_tag_pairs:
+        for tag_postings in rng.choices(postings, weights=tag_pairs, k=sample_pairs):
+            first, second = rng.sample(tag_postings, 2)
+            common = len(
+                set(corpus.similarity_codes(first)).intersection(
+                    corpus.similarity_codes(second)
+                )
+            )
+            smaller_count = min(corpus.row_length(first), corpus.row_length(second))
+            samples.append((common / smaller_count, total_tag_pairs / common))
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    histogram = [[0.0, 0.0] for _ in range(bins)]
+    pairs_above = [[0.0, 0.0] for _ in thresholds]
+    sharing_pairs = [0.0, 0.0]
+    for similarity, weight in samples:
+        for sums in [sharing_pairs, histogram[min(int(similarity * bins), bins - 1)]] + [
+            x for x, t in zip(pairs_above, thresholds) if similarity > t
+        ]:
+            sums[0] += weight
+            sums[1] += weight**2
+
+    return {
+        "records": len(corpus),
+        "total_pairs": len(corpus) * (len(corpus) - 1) // 2,
+        "sharing_pairs": _weighted_estimate(*sharing_pairs, len(samples), z),
+        "bin_edges": [x / bins for x in range(bins + 1)],
+        "histogram": [_weighted_estimate(*x, len(samples), z) for x in histogram],
+        "thresholds": thresholds,
+        "pairs_above": [_weighted_estimate(*x, len(samples), z) for x in pairs_above],
+    }
+
+
+def _weighted_estimate(total: float, total_of_squares: float, samples: int, z: float) -> Dict:
+    """
+    This function estimates a pair count as the mean weight of the samples in the counted set
+    (samples outside of it count as 0), with a normal approximation confidence interval.
+
+    Args:
+        total (float): Sum of weights of the samples in the counted set.
+        total_of_squares (float): Sum of squared weights of the samples in the counted set.
+        samples (int): Number of all samples.
+        z (float): Quantile of the normal distribution for the confidence level.
+
+    Returns:
+        Dict: 'estimate', 'lower' and 'upper'.
+    """
+    if samples == 0:
+        return {"estimate": 0.0, "lower": 0.0, "upper": 0.0}
+    mean = total / samples
+    variance = 0.0
+    if samples > 1:
+        variance = max(0.0, (total_of_squares - samples * mean**2) / (samples - 1))
+    margin = z * math.sqrt(variance / samples)
+    return {
+        "estimate": mean,
+        "lower": max(0.0, mean - margin),
+        "upper": mean + margin,
+    }
@@ -0,0 +1,388 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Any, Hashable, Iterable, List, Set, Tuple
+
+from cluster.clustering_loop import _clustering_loop, _first_iteration_from_summary
+from cluster.clustering_utils import _first_iteration_summary
+from cluster.encoded_corpus import CODE_FORMAT, ID_FORMAT, OFFSET_FORMAT, EncodedCorpus
+from cluster.prepare_data import _prepare_output
+
+
+class WindowedCluster:
+    """
+    Clusters a sliding window of records, e.g. "what is trending in the last 48 hours".
+
+    Records are encoded once, when they are inserted: the clusterer keeps a tag vocabulary,
+    the number of occurrences of every tag in the window (whether it occurs more than once,
+    which makes it a similarity tag in EncodedCorpus) and per-tag postings, all updated as
+    records are inserted and expired.
+
+    A full clustering of the window is the same as cluster() on the tags of the records in the
+    window, in insertion order. Between full clusterings the clusters are kept, and a call of
+    clusters() only reclusters the neighbourhood of the records inserted and expired since the
+    last call: the records connected to them through chains of similar records, the clusters
+    containing those records or expired members, and the clusters that could merge with those
+    clusters in the next iterations.
+    First iteration similarity depends on the order of all records sharing tags, so these
+    updates drift from cluster(). `staleness` counts the records inserted and expired since
+    the last full clustering relative to the window size, and once it passes `max_staleness`
+    clusters() clusters the whole window again.
+    """
+
+    def __init__(
+        self,
+        min_elements_in_cluster: int,
+        min_similarity_first_iter: float,
+        min_similarity_next_iters: float = None,
+        window: Any = None,
+        max_staleness: float = 0.05,
+    ):
+        """
+        Args:
+            min_elements_in_cluster (int): The minimum number of elements in a cluster.
+            min_similarity_first_iter (float): The minimum similarity for the first iteration.
+            min_similarity_next_iters (float, optional): The minimum similarity for the next iterations. Defaults to min_similarity_first_iter.
+            window (optional): Width of the window used by advance(), in the units of the timestamps.
+            max_staleness (float, optional): Records inserted and expired since the last full
+                clustering, as a fraction of the records in the window, after which clusters()
+                clusters the whole window again. 0 makes every call a full clustering.
+                Defaults to 0.05.
+        """
+        if not min_similarity_next_iters:
+            min_similarity_next_iters = min_similarity_first_iter
+        if not (0 < min_similarity_first_iter < 1) or not (
+            0 < min_similarity_next_iters < 1
+        ):
+            raise ValueError("Similarities should be in range 0 < x < 1")
+        if max_staleness < 0:
+            raise ValueError("max_staleness should not be negative")
+
+        self.min_elements_in_cluster = min_elements_in_cluster
+        self.min_similarity_first_iter = min_similarity_first_iter
+        self.min_similarity_next_iters = min_similarity_next_iters
+        self.window = window
+        self.max_staleness = max_staleness
+
+        self._next_seq = 0
+        self._records = {}
+        self._expiry_heap = []
+        self._vocabulary = {}
+        self._next_code = 0
+        self._tag_counts = {}
+        self._postings = {}
+        self._clusters = None
+        self._clusters_of = {}
+        self._next_cluster_id = 0
+        self._seeds = set()
+        self._changed_clusters = set()
+        self._changes = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def staleness(self) -> float:
+        """
+        Records inserted and expired since the last full clustering, as a fraction of the
+        records in the window. 0 means the clusters are the same as the ones of cluster().
+        """
+        if self._clusters is None:
+            return 0.0
+        return self._changes / max(len(self._records), 1)
+
+    def insert(self, key: Hashable, tags: list, timestamp: Any) -> None:
+        """
+        This function adds a record to the window.
+
+        Args:
+            key (Hashable): Identifier of the record, returned as 'source_key' in the output.
+            tags (list): The tags of the record.
+            timestamp: The time of the record, used for expiring it.
+        """
+        seq = self._next_seq
+        self._next_seq += 1
+        codes = []
+        for tag in tags:
+            code = self._vocabulary.get(tag)
+            if code is None:
+                code = self._vocabulary[tag] = self._next_code
+                self._next_code += 1
+                self._tag_counts[code] = 0
+                self._postings[code] = set()
+            self._tag_counts[code] += 1
+            self._postings[code].add(seq)
+            codes.append(code)
+        self._records[seq] = {
+            "key": key,
+            "tags": tags,
+            "codes": tuple(codes),
+            "distinct": frozenset(codes),
+            "timestamp": timestamp,
+        }
+        heapq.heappush(self._expiry_heap, (timestamp, seq))
+        self._seeds.add(seq)
+        self._changes += 1
+
+    def expire(self, before: Any) -> List[Hashable]:
+        """
+        This function removes all records with a timestamp older than `before`.
+
+        Args:
+            before: Records with a timestamp lower than this value are removed.
+
+        Returns:
+            List[Hashable]: Keys of the removed records.
+        """
+        expired = []
+        while self._expiry_heap and self._expiry_heap[0][0] < before:
+            _, seq = heapq.heappop(self._expiry_heap)
+            if self._clusters is not None:
+                self._seeds.update(self._similar_records(seq))
+            record = self._records.pop(seq)
+            expired.append(record["key"])
+            self._seeds.discard(seq)
+            self._changes += 1
+            for tag, code in zip(record["tags"], record["codes"]):
+                self._tag_counts[code] -= 1
+                self._postings[code].discard(seq)
+                if self._tag_counts[code] == 0:
+                    del self._tag_counts[code]
+                    del self._postings[code]
+                    del self._vocabulary[tag]
+            for cluster_id in self._clusters_of.pop(seq, ()):
+                self._clusters[cluster_id] = tuple(
+                    x for x in self._clusters[cluster_id] if x != seq
+                )
+                self._changed_clusters.add(cluster_id)
+        return expired
+
+    def advance(self, now: Any) -> List[Hashable]:
+        """
+        This function moves the window so that it ends at `now`.
+
+        Args:
+            now: The current time.
+
+        Returns:
+            List[Hashable]: Keys of the removed records.
+        """
+        if self.window is None:
+            raise ValueError("advance() requires the window to be set")
+        return self.expire(now - self.window)
+
+    def clusters(self) -> list:
+        """
+        This function returns the clusters of the records currently in the window, updating the
+        clusters around the records inserted and expired since the last call, or clustering the
+        whole window again once `staleness` is over `max_staleness`.
+
+        Returns:
+            list: Clusters in the format returned by cluster(), where 'source_row_number' is the
+            position of the record in the window and 'source_key' is the key passed to insert().
+        """
+        if self._clusters is None or self.staleness > self.max_staleness:
+            self.recluster()
+        elif self._seeds or self._changed_clusters:
+            self._update_clusters()
+
+        seqs = list(self._records)
+        positions = {seq: i for i, seq in enumerate(seqs)}
+        output = _prepare_output(
+            [
+                [positions[x] for x in members]
+                for members in sorted(self._clusters.values(), key=len)
+            ],
+            [self._records[seq]["tags"] for seq in seqs],
+        )
+        for output_cluster in output:
+            for element in output_cluster:
+                element["source_key"] = self._records[
+                    seqs[element["source_row_number"]]
+                ]["key"]
+        return output
+
+    def recluster(self) -> None:
+        """
+        This function clusters all records in the window from scratch, dropping the clusters
+        kept between calls. The next clusters() call returns the same clusters as cluster().
+        """
+        self._clusters = {}
+        self._clusters_of = {}
+        self._seeds = set()
+        self._changed_clusters = set()
+        self._changes = 0
+        self._add_clusters(self._cluster_records(list(self._records)))
+
+    def _update_clusters(self) -> None:
+        """
+        This function reclusters the neighbourhood of the records inserted and expired since the
+        last call and replaces the clusters in it. The neighbourhood takes in every record
+        reachable through a chain of similar records, as first iteration tags are extended along
+        such chains, the clusters containing those records and the clusters they could merge with.
+        """
+        seeds = set(self._seeds)
+        stack = list(self._seeds)
+        while stack:
+            for similar in self._similar_records(stack.pop()):
+                if similar not in seeds:
+                    seeds.add(similar)
+                    stack.append(similar)
+        affected = set(self._changed_clusters)
+        for seq in seeds:
+            affected.update(self._clusters_of.get(seq, ()))
+        affected.update(self._merge_neighbours(affected))
+
+        records = set(seeds)
+        for cluster_id in affected:
+            records.update(self._clusters.pop(cluster_id))
+        for seq in records:
+            cluster_ids = self._clusters_of.get(seq)
+            if cluster_ids is not None:
+                cluster_ids.difference_update(affected)
+                if not cluster_ids:
+                    del self._clusters_of[seq]
+
+        self._seeds = set()
+        self._changed_clusters = set()
+        present = set(self._clusters.values())
+        self._add_clusters(
+            x for x in self._cluster_records(sorted(records)) if x not in present
+        )
+
+    def _similar_records(self, seq: int) -> List[int]:
+        """
+        This function finds the records whose similarity to the record, as scored in the first
+        iteration before tags are extended, is over min_similarity_first_iter.
+
+        Args:
+            seq (int): Sequence number of the record.
+
+        Returns:
+            List[int]: Sequence numbers of the similar records.
+        """
+        distinct = self._records[seq]["distinct"]
+        common_counts = {}
+        for code in distinct:
+            if self._tag_counts[code] < 2:
+                continue
+            for other_seq in self._postings[code]:
+                if other_seq != seq:
+                    common_counts[other_seq] = common_counts.get(other_seq, 0) + 1
+        similar = []
+        for other_seq, common_count in common_counts.items():
+            smaller_count = min(len(distinct), len(self._records[other_seq]["distinct"]))
+            if common_count / smaller_count > self.min_similarity_first_iter:
+                similar.append(other_seq)
+        return similar
+
+    def _merge_neighbours(self, cluster_ids: Set[int]) -> Set[int]:
+        """
+        This function finds the clusters that could merge with the given ones in the next
+        iterations: their tags cover min_similarity_next_iters of the tags of the smaller of
+        the two clusters, as in _similarity_agains_all.
+
+        Args:
+            cluster_ids (Set[int]): Ids of the clusters.
+
+        Returns:
+            Set[int]: Ids of the neighbouring clusters, not including the given ones.
+        """
+        cluster_tags = {}
+
+        def tags_of(cluster_id):
+            tags = cluster_tags.get(cluster_id)
+            if tags is None:
+                tags = cluster_tags[cluster_id] = frozenset().union(
+                    *(self._records[x]["distinct"] for x in self._clusters[cluster_id])
+                )
+            return tags
+
+        neighbours = set()
+        for cluster_id in cluster_ids:
+            tags = tags_of(cluster_id)
+            candidates = set()
+            for code in tags:
+                for seq in self._postings.get(code, ()):
+                    candidates.update(self._clusters_of.get(seq, ()))
+            for candidate in candidates - cluster_ids - neighbours:
+                other_tags = tags_of(candidate)
+                smaller_count = min(len(tags), len(other_tags))
+                if smaller_count and (
+                    len(tags & other_tags) / smaller_count >= self.min_similarity_next_iters
+                ):
+                    neighbours.add(candidate)
+        return neighbours
+
+    def _encode_records(self, seqs: List[int]) -> EncodedCorpus:
+        """
+        This function builds the corpus of the records out of their codes, numbering the tags
+        that occur more than once in the window first, as EncodedCorpus.encode does.
+
+        Args:
+            seqs (List[int]): Sequence numbers of the records, in window order.
+
+        Returns:
+            EncodedCorpus: The records, with their positions in `seqs` as ids.
+        """
+        local_codes = {}
+        for shared in (True, False):
+            for seq in seqs:
+                for code in self._records[seq]["codes"]:
+                    if (self._tag_counts[code] > 1) == shared and code not in local_codes:
+                        local_codes[code] = len(local_codes)
+            if shared:
+                similarity_tags = len(local_codes)
+
+        ids = array(ID_FORMAT)
+        offsets = array(OFFSET_FORMAT, [0])
+        codes = array(CODE_FORMAT)
+        similarity_lengths = array(CODE_FORMAT)
+        for i, seq in enumerate(seqs):
+            row_codes = sorted(local_codes[x] for x in self._records[seq]["distinct"])
+            similarity_length = bisect_left(row_codes, similarity_tags)
+            if similarity_length == 0:
+                continue
+            ids.append(i)
+            codes.extend(row_codes)
+            offsets.append(len(codes))
+            similarity_lengths.append(similarity_length)
+        return EncodedCorpus(ids, offsets, codes, similarity_lengths, similarity_tags)
+
+    def _cluster_records(self, seqs: List[int]) -> List[Tuple[int, ...]]:
+        """
+        This function runs the whole algorithm on the records, as cluster() does on their tags.
+
+        Args:
+            seqs (List[int]): Sequence numbers of the records, in window order.
+
+        Returns:
+            List[Tuple[int, ...]]: The clusters as sorted sequence numbers, in the order of cluster().
+        """
+        corpus = self._encode_records(seqs)
+        summary = _first_iteration_summary(corpus, self.min_similarity_first_iter)
+        (
+            empty_similarity_clusters,
+            pairs_to_merge,
+            previous_clusters,
+        ) = _first_iteration_from_summary(
+            summary,
+            self.min_similarity_first_iter,
+            min_elements_in_cluster=self.min_elements_in_cluster,
+        )
+        final_clusters = _clustering_loop(
+            empty_similarity_clusters,
+            pairs_to_merge,
+            previous_clusters,
+            min_similarity=self.min_similarity_next_iters,
+            min_elements_in_cluster=self.min_elements_in_cluster,
+        )
+        return [tuple(seqs[x] for x in members) for members in final_clusters]
+
+    def _add_clusters(self, clusters: Iterable[Tuple[int, ...]]) -> None:
+        for members in clusters:
+            cluster_id = self._next_cluster_id
+            self._next_cluster_id += 1
+            self._clusters[cluster_id] = members
+            for seq in members:
+                self._clusters_of.setdefault(seq, set()).add(cluster_id)
@@ -5,6 +5,10 @@ setup(
     name="categorical_cluster",
     version="0.3",
     packages=find_packages(),
+    extras_require={"arrow": ["pyarrow"]},
+    entry_points={
+        "console_scripts": ["categorical-cluster=cluster.cli:main"],
+    },
     description="A package for clustering categorical data",
     long_description=open("README.md").read(),
     long_description_content_type="text/markdown",
@@ -0,0 +1,229 @@
+"""
+A stand-in for a service clustering on demand with cluster_async(), for testing it under
+concurrent load. It speaks just enough HTTP/1.1 (one request per connection):
+
+    POST /cluster  {"data": [[tag, ...], ...], "min_elements_in_cluster": 3, ...}
+                   -> {"clusters": [[row number, ...], ...], "rounds": 2}
+    GET /health    -> {"status": "ok"}, answered while clusterings are running
+
+    python -m tests.stand_in_server serve --port 8080 --workers 4
+    python -m tests.stand_in_server load --port 8080 --requests 40 --concurrency 8 --distinct 4
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cluster.async_cluster import AsyncClusterRunner, cluster_async
+
+CLUSTER_PARAMS = (
+    "min_elements_in_cluster",
+    "min_similarity_first_iter",
+    "min_similarity_next_iters",
+    "max_rounds",
+    "time_budget",
+    "min_gain",
+)
+
+
+def request_rows(seed: int, size: int) -> List[List[str]]:
+    """
+    This function generates the rows of a request: videos tagged from a few overlapping
+    playlists, so a clustering takes several merge rounds.
+    """
+    rng = random.Random(seed)
+    playlists = [
+        [f"tag{rng.randrange(40)}" for _ in range(rng.randint(4, 8))] for _ in range(8)
+    ]
+    rows = []
+    for i in range(size):
+        tags = rng.sample(rng.choice(playlists), rng.randint(2, 4))
+        rows.append(tags + [f"video{i}"])
+    return rows
+
+
+async def start_server(
+    runner: AsyncClusterRunner, host: str = "127.0.0.1", port: int = 0
+) -> asyncio.AbstractServer:
+    """
+    This function starts the server, port 0 picks a free port.
+    """
+
+    async def handle(reader, writer):
+        try:
+            method, path, body = await _read_request(reader)
+            if method == "GET" and path == "/health":
+                await _write_response(writer, 200, {"status": "ok"})
+            elif method == "POST" and path == "/cluster":
+                await _write_response(writer, *await _cluster(runner, body))
+            else:
+                await _write_response(writer, 404, {"error": "not found"})
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def _cluster(runner: AsyncClusterRunner, body: bytes) -> Tuple[int, Dict]:
+    try:
+        request = json.loads(body)
+        job = cluster_async(
+            request["data"],
+            runner=runner,
+            **{x: request[x] for x in CLUSTER_PARAMS if x in request},
+        )
+    except (ValueError, KeyError, TypeError) as error:
+        return 400, {"error": str(error)}
+    rounds = 0
+    async for progress in job.progress():
+        rounds = progress["round"]
+    try:
+        clusters = await job
+    except ValueError as error:
+        return 400, {"error": str(error)}
+    return 200, {
+        "clusters": [[x["source_row_number"] for x in y] for y in clusters],
+        "rounds": rounds,
+    }
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    method, path, _ = (await reader.readline()).decode().split(" ", 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode().strip()
+        if not line:
+            break
+        name, value = line.split(":", 1)
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, path, body
+
+
+async def _write_response(writer: asyncio.StreamWriter, status: int, content: Dict) -> None:
+    body = json.dumps(content).encode()
+    writer.write(
+        b"HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n"
+        b"Connection: close\r\n\r\n"
+        % (status, b"OK" if status == 200 else b"Error", len(body))
+    )
+    writer.write(body)
+    await writer.drain()
+
+
+async def request(
+    host: str, port: int, method: str, path: str, content: Optional[Dict] = None
+) -> Tuple[int, Dict]:
+    """
+    This function sends a request to the server and returns the status and the decoded body.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(content).encode() if content is not None else b""
+    writer.write(
+        b"%s %s HTTP/1.1\r\nHost: %s\r\nContent-Length: %d\r\n\r\n"
+        % (method.encode(), path.encode(), host.encode(), len(body))
+    )
+    writer.write(body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response = await reader.read()
+    writer.close()
+    return status, json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+async def load(
+    host: str,
+    port: int,
+    requests: int,
+    concurrency: int,
+    distinct: int,
+    size: int = 300,
+    **params,
+) -> Dict:
+    """
+    This function sends `requests` cluster requests over `distinct` datasets, at most
+    `concurrency` at a time, and probes /health while they run.
+
+    Returns:
+        Dict: Latencies of the cluster requests and of the health probes, in seconds.
+    """
+    params = {"min_elements_in_cluster": 3, "min_similarity_first_iter": 0.5, **params}
+    datasets = [request_rows(seed, size) for seed in range(distinct)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    probes = []
+
+    async def send(index):
+        async with semaphore:
+            start = time.perf_counter()
+            status, _ = await request(
+                host, port, "POST", "/cluster", {"data": datasets[index % distinct], **params}
+            )
+            latencies.append(time.perf_counter() - start)
+            return status
+
+    async def probe(done):
+        while not done.is_set():
+            start = time.perf_counter()
+            await request(host, port, "GET", "/health")
+            probes.append(time.perf_counter() - start)
+            await asyncio.sleep(0.05)
+
+    done = asyncio.Event()
+    prober = asyncio.create_task(probe(done))
+    statuses = await asyncio.gather(*(send(x) for x in range(requests)))
+    done.set()
+    await prober
+    return {
+        "statuses": statuses,
+        "cluster_latencies": latencies,
+        "health_latencies": probes,
+    }
+
+
+def _summary(latencies: List[float]) -> str:
+    if not latencies:
+        return "-"
+    return (
+        f"median {statistics.median(latencies):.3f}s, max {max(latencies):.3f}s, "
+        f"n={len(latencies)}"
+    )
+
+
+async def _serve(args) -> None:
+    async with AsyncClusterRunner(max_jobs=args.max_jobs, workers=args.workers) as runner:
+        server = await start_server(runner, args.host, args.port)
+        print(f"Listening on {server.sockets[0].getsockname()}")
+        async with server:
+            await server.serve_forever()
+
+
+async def _load(args) -> None:
+    result = await load(
+        args.host, args.port, args.requests, args.concurrency, args.distinct, args.size
+    )
+    print(f"statuses: {sorted(set(result['statuses']))}")
+    print(f"cluster: {_summary(result['cluster_latencies'])}")
+    print(f"health:  {_summary(result['health_latencies'])}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("mode", choices=["serve", "load"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-jobs", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=4)
+    parser.add_argument("--size", type=int, default=300)
+    args = parser.parse_args(argv)
+    asyncio.run(_serve(args) if args.mode == "serve" else _load(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import unittest
+
+import pytest
+
+from cluster.arrow_input import _encode_list_column
+from cluster.categorical_cluster import cluster
+from cluster.encoded_corpus import EncodedCorpus
+
+pa = pytest.importorskip("pyarrow")
+
+# Rows with repeated tags, null tags, null and empty rows and tags occurring once, so every
+# rule of the encoding shows up in a few rows.
+DATA = [
+    ["red", "round", "sweet"],
+    ["red", "round", "sour", "red"],
+    None,
+    ["green", "round", None, "sour"],
+    [],
+    ["yellow", "long", "sweet"],
+    ["yellow", "long", "sweet", "soft"],
+    ["yellow", None, "long"],
+    ["purple"],
+    ["red", "round", "sweet", "small"],
+    ["green", "round", "sour"],
+    ["yellow", "long", "sweet"],
+]
+ROWS = [[x for x in row if x is not None] if row else [] for row in DATA]
+
+
+def _arrays(corpus):
+    return (
+        list(corpus.ids),
+        list(corpus.offsets),
+        list(corpus.codes),
+        list(corpus.similarity_lengths),
+        corpus.similarity_tags,
+    )
+
+
+class TestArrowInput(unittest.TestCase):
+    def setUp(self):
+        self.params = dict(
+            min_elements_in_cluster=2,
+            min_similarity_first_iter=0.6,
+            min_similarity_next_iters=0.5,
+        )
+        self.expected = _arrays(EncodedCorpus.encode(ROWS))
+
+    def test_list_array(self):
+        corpus, rows = _encode_list_column(pa.array(DATA, type=pa.list_(pa.string())))
+        self.assertEqual(_arrays(corpus), self.expected)
+        self.assertEqual([rows[i] for i in range(len(rows))], DATA)
+
+    def test_chunked_array(self):
+        column = pa.chunked_array(
+            [DATA[:2], [], DATA[2:7], DATA[7:]], type=pa.large_list(pa.string())
+        )
+        corpus, rows = _encode_list_column(column)
+        self.assertEqual(_arrays(corpus), self.expected)
+        self.assertEqual(rows[8], ["purple"])
+
+    def test_sliced_array(self):
+        column = pa.array(DATA + DATA, type=pa.list_(pa.string())).slice(len(DATA))
+        corpus, _ = _encode_list_column(column)
+        self.assertEqual(_arrays(corpus), self.expected)
+
+    def test_cluster_matches_lists(self):
+        column = pa.chunked_array([DATA[:5], DATA[5:]], type=pa.list_(pa.string()))
+        result = cluster(column, **self.params)
+        self.assertEqual(
+            [[x["source_row_number"] for x in c] for c in result],
+            [[x["source_row_number"] for x in c] for c in cluster(ROWS, **self.params)],
+        )
+        self.assertEqual(result[0][0]["source_data"], DATA[result[0][0]["source_row_number"]])
+
+    def test_pandas_series(self):
+        pd = pytest.importorskip("pandas")
+        corpus, _ = _encode_list_column(pd.Series(DATA))
+        self.assertEqual(_arrays(corpus), self.expected)
+
+    def test_not_a_list_column(self):
+        with self.assertRaises(TypeError):
+            cluster(pa.array(["a", "b"]), **self.params)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import pytest
+
+from cluster import async_cluster
+from cluster.async_cluster import AsyncClusterRunner, _request_key, cluster_async
+from cluster.categorical_cluster import cluster
+from tests.stand_in_server import load, request, request_rows, start_server
+
+
+class TestClusterAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.data = request_rows(seed=3, size=150)
+        self.params = dict(
+            min_elements_in_cluster=3,
+            min_similarity_first_iter=0.5,
+            min_similarity_next_iters=0.4,
+        )
+
+    async def asyncSetUp(self):
+        self.runner = AsyncClusterRunner(max_jobs=2)
+
+    async def asyncTearDown(self):
+        await self.runner.aclose()
+
+    async def test_same_result_as_cluster(self):
+        expected = cluster(self.data, **self.params)
+        job = cluster_async(self.data, runner=self.runner, **self.params)
+        progress = [x async for x in job.progress()]
+        self.assertEqual(await job, expected)
+        self.assertEqual([x["round"] for x in progress], list(range(len(progress))))
+        self.assertEqual(progress[-1]["finalized"], len(expected))
+
+    async def test_coalesces_identical_requests(self):
+        job_1 = cluster_async(self.data, runner=self.runner, **self.params)
+        job_2 = cluster_async([list(x) for x in self.data], runner=self.runner, **self.params)
+        job_3 = cluster_async(self.data, runner=self.runner, min_elements_in_cluster=2,
+                              min_similarity_first_iter=0.5)
+        await asyncio.wait([job_1._joined, job_2._joined, job_3._joined])
+        self.assertEqual(len(self.runner._in_flight), 2)
+        result_1, result_2, result_3 = await asyncio.gather(job_1, job_2, job_3)
+        self.assertIs(result_1, result_2)
+        self.assertIsNot(result_1, result_3)
+        self.assertEqual(self.runner._in_flight, {})
+
+    async def test_cancel(self):
+        job_1 = cluster_async(self.data, runner=self.runner, **self.params)
+        job_2 = cluster_async(self.data, runner=self.runner, **self.params)
+        job_1.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await job_1
+        self.assertEqual(await job_2, cluster(self.data, **self.params))
+
+        job = cluster_async(self.data, runner=self.runner, **self.params)
+        _, computation = await job._joined
+        task = asyncio.create_task(job._result())
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertTrue(computation.cancelled.is_set())
+        self.assertEqual(self.runner._in_flight, {})
+
+    async def test_fingerprints_in_runner_threads(self):
+        threads = []
+
+        def request_key(data, params):
+            threads.append(threading.current_thread().name)
+            return _request_key(data, params)
+
+        with mock.patch.object(async_cluster, "_request_key", request_key):
+            await cluster_async(self.data, runner=self.runner, **self.params)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith("categorical-cluster"))
+
+    async def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            await cluster_async(self.data, 3, 1.5, runner=self.runner)
+
+
+class TestRequestKey(unittest.TestCase):
+    def test_arrow_columns_are_keyed_by_buffers(self):
+        pa = pytest.importorskip("pyarrow")
+        rows = [["a", "b"], None, [], ["c"]]
+        column = pa.array(rows)
+        self.assertEqual(_request_key(column, {}), _request_key(pa.array(rows), {}))
+        self.assertNotEqual(
+            _request_key(column, {}), _request_key(pa.array([["a", "b"], [], [], ["c"]]), {})
+        )
+        self.assertNotEqual(
+            _request_key(column, {}), _request_key(pa.array([["a", "b"], None, [], ["d"]]), {})
+        )
+        doubled = pa.array([["x"]] * 4 + rows)
+        self.assertNotEqual(
+            _request_key(doubled.slice(0, 4), {}), _request_key(doubled.slice(4), {})
+        )
+        chunked = pa.chunked_array([rows[:2], rows[2:]])
+        self.assertEqual(_request_key(chunked, {}), _request_key(chunked, {}))
+
+
+class TestStandInServer(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_load(self):
+        async with AsyncClusterRunner(max_jobs=2) as runner:
+            server = await start_server(runner)
+            host, port = server.sockets[0].getsockname()[:2]
+            async with server:
+                result = await load(host, port, requests=6, concurrency=6, distinct=2, size=120)
+                status, response = await request(
+                    host, port, "POST", "/cluster",
+                    {"data": request_rows(0, size=120), "min_elements_in_cluster": 3,
+                     "min_similarity_first_iter": 0.5},
+                )
+        expected = cluster(request_rows(0, size=120), 3, 0.5)
+        self.assertEqual(result["statuses"], [200] * 6)
+        self.assertEqual(status, 200)
+        self.assertEqual(
+            response["clusters"], [[x["source_row_number"] for x in y] for y in expected]
+        )
+        self.assertTrue(result["health_latencies"])
+
+
+if __name__ == "__main__":
+    unittest.main()
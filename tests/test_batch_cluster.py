@@ -0,0 +1,52 @@
+import unittest
+
+from cluster.batch_cluster import cluster_many
+from cluster.categorical_cluster import cluster
+
+
+def _groups(count, per_group=10):
+    """
+    Groups of rows sharing three of five group tags, so the number of candidate pairs, which
+    cluster_many schedules by, grows with the number of groups.
+    """
+    return [
+        [f"g{group}-{(i + k) % 5}" for k in range(3)] + [f"g{group}-row{i}"]
+        for group in range(count)
+        for i in range(per_group)
+    ]
+
+
+class TestClusterMany(unittest.TestCase):
+    def setUp(self):
+        self.datasets = [
+            _groups(15),
+            [],
+            _groups(3),
+            _groups(9),
+        ]
+        self.params = dict(
+            min_elements_in_cluster=3,
+            min_similarity_first_iter=0.5,
+            min_similarity_next_iters=0.4,
+        )
+        self.expected = [
+            cluster(x, **self.params) for x in self.datasets
+        ]
+
+    def test_cluster_many_single_worker(self):
+        results, stats = cluster_many(self.datasets, workers=1, **self.params)
+        self.assertEqual(results, self.expected)
+        self.assertEqual([x["records"] for x in stats], [150, 0, 30, 90])
+        self.assertEqual(
+            [x["clusters"] for x in stats], [len(x) for x in self.expected]
+        )
+
+    def test_cluster_many_process_pool(self):
+        results, stats = cluster_many(self.datasets, workers=2, **self.params)
+        self.assertEqual(results, self.expected)
+        self.assertGreater(stats[0]["estimated_pairs"], stats[2]["estimated_pairs"])
+        self.assertEqual(stats[1]["estimated_pairs"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+import pytest
+
+from cluster.categorical_cluster import cluster
+from cluster.cli import EXIT_IO_ERROR, EXIT_INVALID_PARAMETERS, EXIT_OK, main
+
+# Two groups of similar rows and a row sharing nothing, written half as lists and half as
+# objects with a tags column.
+DATA = [
+    ["jazz", "piano", "live"],
+    ["jazz", "piano", "trio"],
+    ["rock", "guitar", "live"],
+    ["jazz", "piano", "live", "trio"],
+    ["rock", "guitar", "drums"],
+    ["rock", "guitar", "drums", "live"],
+    ["podcast"],
+]
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, "input.jsonl")
+        self.output = os.path.join(self.directory.name, "output.jsonl")
+        with open(self.input, "w") as file:
+            for i, row in enumerate(DATA):
+                record = {"tags": row, "id": i} if i % 2 else row
+                file.write(json.dumps(record) + "\n")
+        self.args = [
+            "--min-similarity-first-iter",
+            "0.6",
+            "--min-elements-in-cluster",
+            "2",
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _write(self, name, lines):
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write("".join(x + "\n" for x in lines))
+        return path
+
+    def test_writes_all_clusters(self):
+        code = main([self.input, "-o", self.output] + self.args)
+        self.assertEqual(code, EXIT_OK)
+        with open(self.output) as file:
+            written = [json.loads(x) for x in file]
+        expected = cluster([list(x) for x in DATA], 2, 0.6)
+        self.assertEqual(len(expected), 2)
+        self.assertEqual(
+            sorted(written, key=lambda x: [y["source_row_number"] for y in x]),
+            sorted(expected, key=lambda x: [y["source_row_number"] for y in x]),
+        )
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(SystemExit) as context:
+            main([self.input, "--min-similarity-first-iter", "1.5", "--min-elements-in-cluster", "3"])
+        self.assertEqual(context.exception.code, EXIT_INVALID_PARAMETERS)
+        with self.assertRaises(SystemExit) as context:
+            main([self.input, "--workers", "0"] + self.args)
+        self.assertEqual(context.exception.code, EXIT_INVALID_PARAMETERS)
+
+    def test_missing_input(self):
+        missing = os.path.join(self.directory.name, "missing.jsonl")
+        self.assertEqual(main([missing] + self.args), EXIT_IO_ERROR)
+
+    def test_invalid_input(self):
+        invalid = self._write("invalid.jsonl", ['["a", "b"]', '[["a"], 1]'])
+        self.assertEqual(main([invalid] + self.args), EXIT_IO_ERROR)
+        not_a_list = self._write("not_a_list.jsonl", ['["a", "b"]', '"a"'])
+        self.assertEqual(main([not_a_list] + self.args), EXIT_IO_ERROR)
+
+    def test_object_without_column(self):
+        missing_column = self._write(
+            "missing_column.jsonl", ['{"tags": ["a", "b"]}', '{"labels": ["a", "b"]}']
+        )
+        self.assertEqual(main([missing_column] + self.args), EXIT_IO_ERROR)
+        self.assertEqual(main([missing_column, "--column", "labels"] + self.args), EXIT_IO_ERROR)
+
+    def test_pickle_only_when_explicit(self):
+        path = os.path.join(self.directory.name, "input.pkl")
+        with open(path, "wb") as file:
+            pickle.dump(DATA, file)
+        self.assertEqual(main([path] + self.args), EXIT_IO_ERROR)
+        self.assertEqual(
+            main([path, "--format", "pickle", "-o", self.output] + self.args), EXIT_OK
+        )
+        with open(self.output) as file:
+            self.assertEqual(len(file.readlines()), 2)
+
+    def test_parquet_column(self):
+        pa = pytest.importorskip("pyarrow")
+        pq = pytest.importorskip("pyarrow.parquet")
+
+        parquet = os.path.join(self.directory.name, "input.parquet")
+        pq.write_table(pa.table({"labels": DATA}), parquet)
+        self.assertEqual(main([parquet] + self.args), EXIT_IO_ERROR)
+        self.assertEqual(
+            main([parquet, "--column", "labels", "-o", self.output] + self.args), EXIT_OK
+        )
+        with open(self.output) as file:
+            self.assertEqual(len(file.readlines()), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
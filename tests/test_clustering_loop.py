@@ -0,0 +1,97 @@
+import itertools
+import random
+import time
+import unittest
+from unittest import mock
+
+from cluster.categorical_cluster import cluster
+from cluster.clustering_loop import _merge_gain
+
+
+def _chained_topics(seed, topics=12, size=120):
+    """
+    Records sampled from topics of six tags, some of them borrowing tags of the next topic, so
+    clusters keep merging along the chain for several rounds.
+    """
+    rng = random.Random(seed)
+    data = []
+    for i in range(size):
+        topic = i % topics
+        tags = [f"t{topic}-{x}" for x in rng.sample(range(6), 4)]
+        tags += [f"t{topic + 1}-{x}" for x in rng.sample(range(6), rng.randint(0, 2))]
+        data.append(tags)
+    return data
+
+
+class TestStoppingRules(unittest.TestCase):
+    def setUp(self):
+        self.data = _chained_topics(seed=0)
+        self.params = dict(
+            min_elements_in_cluster=3,
+            min_similarity_first_iter=0.5,
+            min_similarity_next_iters=0.4,
+        )
+
+    def _cluster(self, **kwargs):
+        stop_report = {}
+        result = cluster(self.data, stop_report=stop_report, **self.params, **kwargs)
+        return result, stop_report
+
+    def test_complete_run(self):
+        result, stop_report = self._cluster()
+        self.assertFalse(stop_report["stopped_early"])
+        self.assertIsNone(stop_report["stop_reason"])
+        self.assertEqual(stop_report["pending_merges"], 0)
+        self.assertGreater(stop_report["rounds"], 1)
+        self.assertEqual(result, cluster(self.data, **self.params))
+
+    def test_max_rounds(self):
+        _, complete = self._cluster()
+        result, stop_report = self._cluster(max_rounds=0)
+        self.assertTrue(stop_report["stopped_early"])
+        self.assertEqual(stop_report["stop_reason"], "max_rounds")
+        self.assertEqual(stop_report["rounds"], 0)
+        self.assertGreater(stop_report["pending_merges"], 0)
+        self.assertTrue(result)
+
+        _, stop_report = self._cluster(max_rounds=complete["rounds"])
+        self.assertFalse(stop_report["stopped_early"])
+
+    def test_time_budget(self):
+        # The clock passes the deadline after the first round.
+        now = time.time()
+        readings = itertools.chain([now], itertools.repeat(now + 3600))
+        with mock.patch("cluster.clustering_loop.time") as clock:
+            clock.time.side_effect = lambda: next(readings)
+            result, stop_report = self._cluster(time_budget=60)
+        self.assertTrue(stop_report["stopped_early"])
+        self.assertEqual(stop_report["stop_reason"], "time_budget")
+        self.assertEqual(stop_report["rounds"], 1)
+        self.assertGreater(stop_report["pending_merges"], 0)
+        self.assertEqual(result, self._cluster(max_rounds=1)[0])
+
+    def test_min_gain(self):
+        _, stop_report = self._cluster(min_gain=0.9)
+        self.assertEqual(stop_report["stop_reason"], "min_gain")
+        _, stop_report = self._cluster(min_gain=0.0)
+        self.assertFalse(stop_report["stopped_early"])
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            self._cluster(max_rounds=-1)
+        with self.assertRaises(ValueError):
+            self._cluster(time_budget=0)
+
+    def test_merge_gain(self):
+        clusters = [
+            {"id": 0, "members": (1, 2)},
+            {"id": 1, "members": (1, 2, 3)},
+            {"id": 2, "members": (4, 5)},
+        ]
+        self.assertEqual(_merge_gain([(0, 1)], clusters), 0.0)
+        self.assertEqual(_merge_gain([(1, 2)], clusters), 1.0)
+        self.assertEqual(_merge_gain([(0, 1), (1, 2)], clusters), 2 / 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
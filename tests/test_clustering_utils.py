@@ -7,6 +7,8 @@ from cluster.clustering_utils import (
     _similarity_agains_all,
     _merge_algo,
     _get_iteration_of_empty_clusters,
+    _merge_pairs,
+    _union_members,
 )
 
 
@@ -98,19 +100,19 @@ class TestRemoveDuplicatesFromFirstIter(unittest.TestCase):
             {
                 "id": 0,
                 "for_finding_duplicates": {1, 2, 3},
-                "all_elements": [1, (2, 0.67), (3, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag1", "tag2", "tag3"},
             },
             {
                 "id": 1,
                 "for_finding_duplicates": {1, 2, 3},
-                "all_elements": [2, (1, 0.67), (3, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag1", "tag2", "tag4"},
             },
             {
                 "id": 2,
                 "for_finding_duplicates": {4, 5, 6},
-                "all_elements": [4, (5, 0.67), (6, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag4", "tag5", "tag6"},
             },
         ]
@@ -119,10 +121,10 @@ class TestRemoveDuplicatesFromFirstIter(unittest.TestCase):
         result = _remove_duplicates_from_first_iter(self.clusters)
         self.assertEqual(len(result), 2)
         self.assertEqual(result[0]["id"], 0)
-        self.assertEqual(result[0]["all_elements"], [1, (2, 0.67), (3, 0.33)])
+        self.assertEqual(result[0]["order_size"], 3)
         self.assertEqual(result[0]["all_tags"], {"tag1", "tag2", "tag3"})
         self.assertEqual(result[1]["id"], 2)
-        self.assertEqual(result[1]["all_elements"], [4, (5, 0.67), (6, 0.33)])
+        self.assertEqual(result[1]["order_size"], 3)
         self.assertEqual(result[1]["all_tags"], {"tag4", "tag5", "tag6"})
 
 
@@ -131,17 +133,17 @@ class TestSimilarityAgainstAll(unittest.TestCase):
         self.clusters = [
             {
                 "id": 0,
-                "all_elements": [1, (2, 0.67), (3, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag1", "tag2", "tag3"},
             },
             {
                 "id": 1,
-                "all_elements": [2, (1, 0.67), (3, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag1", "tag2", "tag4"},
             },
             {
                 "id": 2,
-                "all_elements": [4, (5, 0.67), (6, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag4", "tag5", "tag6"},
             },
         ]
@@ -179,17 +181,17 @@ class TestMergeAlgo(unittest.TestCase):
         self.clusters = [
             {
                 "id": 0,
-                "all_elements": [1, (2, 0.67), (3, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag1", "tag2", "tag3"},
             },
             {
                 "id": 1,
-                "all_elements": [2, (1, 0.67), (3, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag1", "tag2", "tag4"},
             },
             {
                 "id": 2,
-                "all_elements": [4, (5, 0.67), (6, 0.33)],
+                "order_size": 3,
                 "all_tags": {"tag4", "tag5", "tag6"},
             },
         ]
@@ -215,11 +217,13 @@ class TestGetIterationOfEmptyClusters(unittest.TestCase):
         self.similars = [
             {
                 "id": 1,
-                "all_elements": [1, (2, 0.67), (3, 0.33)],
+                "order_size": 3,
+                "members": (1, 2, 3),
             },
             {
                 "id": 2,
-                "all_elements": [4, (5, 0.67), (6, 0.33)],
+                "order_size": 3,
+                "members": (4, 5, 6),
             },
         ]
         self.min_elements_in_cluster = 2
@@ -233,5 +237,31 @@ class TestGetIterationOfEmptyClusters(unittest.TestCase):
         self.assertEqual(result[1], (4, 5, 6))
 
 
+class TestMergePairs(unittest.TestCase):
+    def test_merge_pairs(self):
+        cluster_1 = {
+            "id": 0,
+            "order_size": 5,
+            "members": (1, 2, 3),
+            "all_tags": {"tag1", "tag2"},
+        }
+        cluster_2 = {
+            "id": 1,
+            "order_size": 4,
+            "members": (1, 2, 3, 7),
+            "all_tags": {"tag2", "tag3"},
+        }
+        result = _merge_pairs(cluster_1, cluster_2, 5)
+        self.assertEqual(result["id"], 5)
+        self.assertEqual(result["order_size"], 5 + 4 - 3)
+        self.assertEqual(result["members"], (1, 2, 3, 7))
+        self.assertEqual(result["all_tags"], {"tag1", "tag2", "tag3"})
+
+    def test_union_members(self):
+        self.assertEqual(_union_members((1, 4, 9), (2, 4, 10, 12)), (1, 2, 4, 9, 10, 12))
+        self.assertEqual(_union_members((), (3,)), (3,))
+        self.assertEqual(_union_members((1, 2), (1, 2)), (1, 2))
+
+
 if __name__ == "__main__":
     unittest.main()
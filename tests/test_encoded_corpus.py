@@ -0,0 +1,71 @@
+import copy
+import unittest
+
+from cluster.clustering_utils import _first_iteration_summary, _initial_similarity_against_all
+from cluster.encoded_corpus import EncodedCorpus
+
+
+def _catalogue(size):
+    """
+    Items described by colour, size and sometimes shape, with a repeated colour tag in every
+    seventh row and a tag of their own, so rows overlap on one to three tags.
+    """
+    return [
+        [f"colour{i % 4}", f"size{i % 3}"]
+        + [f"shape{i % 5}"] * (i % 2)
+        + [f"colour{i % 4}"] * (i % 7 == 0)
+        + [f"item{i}"]
+        for i in range(size)
+    ]
+
+
+class TestEncodedCorpus(unittest.TestCase):
+    def test_encode(self):
+        data = [["a", "b", "x"], ["y"], ["b", "c", "a", "a"], ["z", "z"], ["c"]]
+        original = copy.deepcopy(data)
+        corpus = EncodedCorpus.encode(data)
+        self.assertEqual(data, original)
+        self.assertEqual(list(corpus.ids), [0, 2, 3, 4])
+        self.assertEqual(corpus.similarity_tags, 4)
+        self.assertEqual(list(corpus.row(0)), [0, 1, 4])
+        self.assertEqual(list(corpus.similarity_codes(0)), [0, 1])
+        self.assertEqual(list(corpus.row(1)), [0, 1, 2])
+        self.assertEqual(list(corpus.row(2)), [3])
+        self.assertEqual([corpus.row_length(x) for x in range(len(corpus))], [3, 3, 1, 1])
+
+    def test_overlaps(self):
+        corpus = EncodedCorpus.encode(_catalogue(80))
+        for row, row_overlaps in enumerate(corpus.overlaps()):
+            expected = []
+            for other_row in range(len(corpus)):
+                common = set(corpus.similarity_codes(row)) & set(
+                    corpus.similarity_codes(other_row)
+                )
+                if common:
+                    expected.append((other_row, len(common)))
+            self.assertEqual(row_overlaps, expected)
+
+    def test_summary_same_as_record_dicts(self):
+        data = _catalogue(150)
+        corpus = EncodedCorpus.encode(data)
+        records = [
+            {
+                "id": corpus.ids[x],
+                "tags": set(data[corpus.ids[x]]),
+                "similarity_tags": set(corpus.similarity_codes(x)),
+            }
+            for x in range(len(corpus))
+        ]
+        expected = [
+            _initial_similarity_against_all(x, records, 0.4, [0.0]) for x in records
+        ]
+        expected = [x for x in expected if x["similarity"]]
+        summary = _first_iteration_summary(corpus, 0.4, [0.0])
+        self.assertEqual(
+            [(x["id"], x["similarity"], len(x["all_tags"])) for x in summary],
+            [(x["id"], x["similarity"], len(x["all_tags"])) for x in expected],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import unittest
+
+from cluster.categorical_cluster import cluster
+from cluster.engine_verification import verify_engine
+from cluster.engines import ProcessPoolEngine, ReferenceEngine
+
+
+def _bridged_groups(seed, groups=10, per_group=8):
+    """
+    Rows sampled from groups of five tags plus one row per group bridging it to the next one,
+    so clusters merge across groups over a few rounds and every engine step has work to do.
+    """
+    rng = random.Random(seed)
+    data = []
+    for group in range(groups):
+        tags = [f"g{group}-{x}" for x in range(5)]
+        next_tags = [f"g{(group + 1) % groups}-{x}" for x in range(5)]
+        data.extend(rng.sample(tags, 3) for _ in range(per_group))
+        data.append(rng.sample(tags, 2) + rng.sample(next_tags, 2))
+    return data
+
+
+class _DroppingPairsEngine(ReferenceEngine):
+    def merge_algo(self, clusters, similars):
+        touched_cluster_ids, empty_similarity, pairs_to_merge = super().merge_algo(
+            clusters, similars
+        )
+        return touched_cluster_ids, empty_similarity, pairs_to_merge[1:]
+
+
+class TestEngines(unittest.TestCase):
+    def setUp(self):
+        self.data = _bridged_groups(seed=0)
+        self.params = dict(
+            min_elements_in_cluster=3,
+            min_similarity_first_iter=0.5,
+            min_similarity_next_iters=0.4,
+        )
+
+    def test_engine_by_name_and_instance(self):
+        expected = cluster(self.data, **self.params)
+        self.assertEqual(
+            cluster(self.data, engine="reference", **self.params), expected
+        )
+        with ProcessPoolEngine(workers=2) as engine:
+            self.assertEqual(
+                cluster(self.data, engine=engine, **self.params), expected
+            )
+            self.assertEqual(
+                cluster(self.data, engine=engine, **self.params), expected
+            )
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            cluster(self.data, engine="missing", **self.params)
+
+    def test_process_pool_engine_is_equivalent(self):
+        result = verify_engine(
+            "process_pool", datasets=[self.data], random_datasets=2, workers=2
+        )
+        self.assertEqual(result, {"equivalent": True, "datasets": 3, "divergence": None})
+
+    def test_divergence_is_reported(self):
+        result = verify_engine(_DroppingPairsEngine(), datasets=[self.data], random_datasets=0)
+        self.assertFalse(result["equivalent"])
+        divergence = result["divergence"]
+        self.assertEqual(divergence["dataset"], 0)
+        self.assertEqual(divergence["step"], "pairs to merge")
+        self.assertEqual(divergence["round"], 0)
+        self.assertEqual(divergence["index"], 0)
+        self.assertNotEqual(divergence["reference"], divergence["engine"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from cluster.categorical_cluster import cluster
+from cluster.engines import ProcessPoolEngine
+from cluster.parallel_scoring import _map_row_ranges
+from cluster.shared_corpus import SharedCorpus
+
+
+def _crash(names, shape, start, stop):
+    os._exit(1)
+
+
+class TestSharedCorpus(unittest.TestCase):
+    def assertUnlinked(self, names):
+        for name in names:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+
+    def test_create_and_attach(self):
+        with SharedCorpus.create([[3, 1, 2], [], [7]]) as corpus:
+            self.assertEqual(len(corpus), 3)
+            attached = SharedCorpus.attach(corpus.names, *corpus.shape)
+            self.assertEqual([list(attached.row(x)) for x in range(3)], [[3, 1, 2], [], [7]])
+            self.assertTrue(attached.codes.readonly)
+            attached.close()
+            names = corpus.names
+        self.assertUnlinked(names)
+
+    def test_unlinked_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with SharedCorpus.create([[1, 2]]) as corpus:
+                names = corpus.names
+                raise RuntimeError()
+        self.assertUnlinked(names)
+
+    def test_unlinked_on_worker_crash(self):
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            with self.assertRaises(BrokenProcessPool):
+                with SharedCorpus.create([[1, 2], [2, 3]]) as corpus:
+                    names = corpus.names
+                    _map_row_ranges(executor, _crash, corpus, 2)
+        self.assertUnlinked(names)
+
+
+class TestParallelCluster(unittest.TestCase):
+    @unittest.skipUnless(os.path.exists("/proc/self/maps"), "needs /proc")
+    def test_workers_keep_no_blocks_mapped(self):
+        engine = ProcessPoolEngine(2)
+        try:
+            cluster([["a", "b"], ["a", "b", "c"], ["b", "c"], ["c", "d"]], 2, 0.5, engine=engine)
+            for pid in engine.executor._processes:
+                with open(f"/proc/{pid}/maps") as maps:
+                    self.assertEqual([x for x in maps if "/psm_" in x], [])
+        finally:
+            engine.close()
+
+    def test_workers_match_single_process(self):
+        # Tags repeat with periods 7, 11 and 5, so every row has similar rows in the row
+        # ranges of the other workers.
+        data = [
+            [f"a{i % 7}", f"b{i % 11}", f"c{i % 5}"] + ([f"row{i}"] if i % 3 else [])
+            for i in range(90)
+        ]
+        params = dict(
+            min_elements_in_cluster=3,
+            min_similarity_first_iter=0.5,
+            min_similarity_next_iters=0.4,
+        )
+        logs = [[0.0], []]
+        parallel_logs = [[0.0], []]
+        expected = cluster(
+            data,
+            similarity_log_initial_iter=logs[0],
+            similrity_log_next_iter=logs[1],
+            **params
+        )
+        result = cluster(
+            data,
+            similarity_log_initial_iter=parallel_logs[0],
+            similrity_log_next_iter=parallel_logs[1],
+            workers=2,
+            **params
+        )
+        self.assertTrue(expected)
+        self.assertEqual(result, expected)
+        self.assertEqual(parallel_logs, logs)
+
+
+if __name__ == "__main__":
+    unittest.main()
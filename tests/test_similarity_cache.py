@@ -0,0 +1,140 @@
+import errno
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from cluster.categorical_cluster import cluster
+from cluster.clustering_utils import _first_iteration_summary
+from cluster.prepare_data import _prepare_data
+from cluster.similarity_cache import FILE_SUFFIX, SimilarityCache
+
+# Groups of rows sharing most of their tags, so first iteration summaries have similarity
+# lists. Keys only depend on the encoded rows, so the other data differs by one row.
+DATA = [
+    ["wool", "knit", "winter", "hat"],
+    ["wool", "knit", "winter", "scarf"],
+    ["wool", "knit", "hat"],
+    ["cotton", "summer", "shirt", "white"],
+    ["cotton", "summer", "shirt", "blue"],
+    ["cotton", "summer", "white"],
+    ["leather", "boots"],
+    ["wool", "winter", "scarf", "gloves"],
+    ["cotton", "shirt", "blue", "linen"],
+] * 3
+OTHER_DATA = DATA[:-1]
+
+
+class TestSimilarityCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data = DATA
+        self.computed = 0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _summary(self, cache, min_similarity=0.5, data=None):
+        combined = _prepare_data(data or self.data)
+
+        def compute():
+            self.computed += 1
+            return _first_iteration_summary(combined, min_similarity)
+
+        return cache.first_iteration_summary(combined, min_similarity, compute)
+
+    def _files(self):
+        return [x for x in os.listdir(self.directory.name) if x.endswith(FILE_SUFFIX)]
+
+    def test_hit_returns_same_summary(self):
+        cache = SimilarityCache(self.directory.name)
+        computed = self._summary(cache)
+        cached = self._summary(cache)
+        self.assertEqual(self.computed, 1)
+        self.assertEqual(
+            [(x["id"], x["similarity"], x["all_tags"]) for x in cached],
+            [(x["id"], x["similarity"], x["all_tags"]) for x in computed],
+        )
+
+    def test_key_includes_threshold_and_data(self):
+        cache = SimilarityCache(self.directory.name)
+        self._summary(cache, min_similarity=0.5)
+        self._summary(cache, min_similarity=0.6)
+        self._summary(cache, data=OTHER_DATA)
+        self.assertEqual(self.computed, 3)
+        self.assertEqual(len(self._files()), 3)
+
+    def test_least_recently_used_evicted(self):
+        cache = SimilarityCache(self.directory.name)
+        self._summary(cache, min_similarity=0.5)
+        size = os.path.getsize(os.path.join(self.directory.name, self._files()[0]))
+        cache.max_bytes = size * 2
+        self._summary(cache, min_similarity=0.6)
+        past = time.time() - 100
+        for name in self._files():
+            os.utime(os.path.join(self.directory.name, name), (past, past))
+        self._summary(cache, min_similarity=0.5)
+        self._summary(cache, min_similarity=0.7)
+        self.assertEqual(self.computed, 3)
+        self._summary(cache, min_similarity=0.5)
+        self.assertEqual(self.computed, 3)
+        self._summary(cache, min_similarity=0.6)
+        self.assertEqual(self.computed, 4)
+
+    def test_corrupted_file_is_recomputed(self):
+        cache = SimilarityCache(self.directory.name)
+        self._summary(cache)
+        path = os.path.join(self.directory.name, self._files()[0])
+        with open(path, "r+b") as file:
+            file.truncate(20)
+        self._summary(cache)
+        self.assertEqual(self.computed, 2)
+
+        size = os.path.getsize(path)
+        with open(path, "r+b") as file:
+            file.seek(size - 3)
+            file.write(bytes(x ^ 0xFF for x in file.read(1)))
+        self.assertEqual(
+            [(x["id"], x["similarity"], x["all_tags"]) for x in self._summary(cache)],
+            [(x["id"], x["similarity"], x["all_tags"]) for x in self._summary(cache)],
+        )
+        self.assertEqual(self.computed, 3)
+
+    def test_cluster_with_cache(self):
+        params = dict(min_elements_in_cluster=3, min_similarity_first_iter=0.5)
+        for min_similarity_next_iters in (0.5, 0.5, 0.4):
+            self.assertEqual(
+                cluster(
+                    self.data,
+                    min_similarity_next_iters=min_similarity_next_iters,
+                    cache_dir=self.directory.name,
+                    **params
+                ),
+                cluster(
+                    self.data,
+                    min_similarity_next_iters=min_similarity_next_iters,
+                    **params
+                ),
+            )
+        self.assertEqual(len(self._files()), 1)
+
+    def test_store_failure_returns_summary(self):
+        cache = SimilarityCache(self.directory.name)
+        expected = _first_iteration_summary(_prepare_data(self.data), 0.5)
+        full = OSError(errno.ENOSPC, "No space left on device")
+        for target in ("tempfile.mkstemp", "os.replace", "os.listdir"):
+            with mock.patch(f"cluster.similarity_cache.{target}", side_effect=full):
+                summary = self._summary(cache)
+            self.assertEqual(
+                [(x["id"], x["similarity"], x["all_tags"]) for x in summary],
+                [(x["id"], x["similarity"], x["all_tags"]) for x in expected],
+            )
+        # Only the write whose eviction failed left a file, and no temporary files are left.
+        self.assertEqual(self.computed, 3)
+        self.assertEqual(os.listdir(self.directory.name), self._files())
+        self.assertEqual(len(self._files()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
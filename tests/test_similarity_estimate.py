@@ -0,0 +1,63 @@
+import itertools
+import random
+import unittest
+
+from cluster.prepare_data import _prepare_data
+from cluster.similarity_estimate import estimate_similarity_distribution
+
+
+def _popular_tags(seed, size=200, tags=60):
+    """
+    Rows of two to six tags drawn with weights falling as 1 / rank, so a few tags are shared
+    by many rows and pairs share anything from one tag to all of them.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (x + 1) for x in range(tags)]
+    return [
+        rng.choices([f"tag{x}" for x in range(tags)], weights, k=rng.randint(2, 6))
+        for _ in range(size)
+    ]
+
+
+class TestEstimateSimilarityDistribution(unittest.TestCase):
+    def setUp(self):
+        self.data = _popular_tags(seed=10)
+        corpus = _prepare_data(self.data)
+        self.similarities = []
+        for first, second in itertools.combinations(range(len(corpus)), 2):
+            common = len(
+                set(corpus.similarity_codes(first)) & set(corpus.similarity_codes(second))
+            )
+            if common:
+                smaller_count = min(corpus.row_length(first), corpus.row_length(second))
+                self.similarities.append(common / smaller_count)
+        self.records = len(corpus)
+
+    def assertWithinBounds(self, exact, estimate):
+        self.assertLessEqual(estimate["lower"], exact)
+        self.assertGreaterEqual(estimate["upper"], exact)
+
+    def test_estimates_match_exact_counts(self):
+        result = estimate_similarity_distribution(
+            self.data, sample_pairs=5000, thresholds=[0.3, 0.5, 0.7], seed=0
+        )
+        self.assertEqual(result["records"], self.records)
+        self.assertEqual(result["total_pairs"], self.records * (self.records - 1) // 2)
+        self.assertWithinBounds(len(self.similarities), result["sharing_pairs"])
+        for threshold, estimate in zip(result["thresholds"], result["pairs_above"]):
+            exact = sum(1 for x in self.similarities if x > threshold)
+            self.assertWithinBounds(exact, estimate)
+        self.assertAlmostEqual(
+            sum(x["estimate"] for x in result["histogram"]),
+            result["sharing_pairs"]["estimate"],
+        )
+        self.assertEqual(len(result["bin_edges"]), len(result["histogram"]) + 1)
+
+    def test_no_shared_tags(self):
+        result = estimate_similarity_distribution([["a"], ["b"], ["c", "c"]], seed=0)
+        self.assertEqual(result["sharing_pairs"]["estimate"], 0.0)
+        self.assertTrue(all(x["upper"] == 0.0 for x in result["pairs_above"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
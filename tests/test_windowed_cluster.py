@@ -0,0 +1,141 @@
+import itertools
+import random
+import unittest
+
+from cluster.categorical_cluster import cluster
+from cluster.windowed_cluster import WindowedCluster
+
+
+def _trending_feed(seed, size, lifetime=10, active=8):
+    """
+    A feed of videos tagged from topics of a small shared vocabulary. A new topic starts every
+    `lifetime` videos and the last `active` topics are trending, so the clusters in a window
+    overlap and keep changing as it slides.
+    """
+    rng = random.Random(seed)
+    topics = []
+    feed = []
+    for i in range(size):
+        if i % lifetime == 0:
+            topics.append([f"tag{rng.randrange(50)}" for _ in range(rng.randint(4, 10))])
+        topic = rng.choice(topics[-active:])
+        tags = rng.sample(topic, rng.randint(1, len(topic)))
+        tags += [f"video{i}-{x}" for x in range(rng.randint(0, 3))]
+        feed.append(tags)
+    return feed
+
+
+def _row_numbers(clusters):
+    return [[x["source_row_number"] for x in c] for c in clusters]
+
+
+def _pair_f1(clusters, expected):
+    pairs = [
+        set(itertools.chain.from_iterable(itertools.combinations(c, 2) for c in x))
+        for x in (clusters, expected)
+    ]
+    if not pairs[0] and not pairs[1]:
+        return 1.0
+    return 2 * len(pairs[0] & pairs[1]) / (len(pairs[0]) + len(pairs[1]))
+
+
+class TestWindowedCluster(unittest.TestCase):
+    def setUp(self):
+        self.params = dict(
+            min_elements_in_cluster=3,
+            min_similarity_first_iter=0.5,
+            min_similarity_next_iters=0.4,
+        )
+
+    def _reference(self, data):
+        return _row_numbers(cluster(data, **self.params))
+
+    def test_matches_cluster_on_full_window(self):
+        data = _trending_feed(seed=0, size=150)
+        windowed = WindowedCluster(**self.params)
+        for i, tags in enumerate(data):
+            windowed.insert(f"video-{i}", tags, timestamp=i)
+        result = windowed.clusters()
+        self.assertEqual(_row_numbers(result), self._reference(data))
+        self.assertEqual(windowed.staleness, 0)
+        for c in result:
+            for element in c:
+                self.assertEqual(
+                    element["source_key"], f"video-{element['source_row_number']}"
+                )
+
+    def test_matches_cluster_without_staleness(self):
+        data = _trending_feed(seed=1, size=200)
+        windowed = WindowedCluster(window=80, max_staleness=0, **self.params)
+        for i, tags in enumerate(data):
+            windowed.insert(i, tags, timestamp=i)
+            windowed.advance(i)
+            if i % 25 == 0:
+                live = data[max(0, i - 80) : i + 1]
+                self.assertEqual(len(windowed), len(live))
+                self.assertEqual(
+                    _row_numbers(windowed.clusters()), self._reference(live)
+                )
+
+    def test_incremental_updates_stay_close_to_cluster(self):
+        # Between full clusterings the result drifts; with the default max_staleness the
+        # clusters agree with cluster() on at least 95% of the co-clustered pairs on average
+        # and on at least 85% after every call.
+        data = _trending_feed(seed=3, size=400)
+        windowed = WindowedCluster(window=150, **self.params)
+        scores = []
+        for i, tags in enumerate(data):
+            windowed.insert(i, tags, timestamp=i)
+            windowed.advance(i)
+            if i >= 150 and i % 3 == 0:
+                clusters = _row_numbers(windowed.clusters())
+                self.assertLessEqual(windowed.staleness, windowed.max_staleness)
+                live = data[max(0, i - 150) : i + 1]
+                scores.append(_pair_f1(clusters, self._reference(live)))
+        self.assertGreaterEqual(sum(scores) / len(scores), 0.95)
+        self.assertGreaterEqual(min(scores), 0.85)
+
+    def test_reclusters_once_stale(self):
+        data = _trending_feed(seed=4, size=112)
+        windowed = WindowedCluster(max_staleness=0.1, **self.params)
+        for i, tags in enumerate(data[:100]):
+            windowed.insert(i, tags, timestamp=i)
+        windowed.clusters()
+        for i in range(100, 105):
+            windowed.insert(i, data[i], timestamp=i)
+        windowed.clusters()
+        self.assertAlmostEqual(windowed.staleness, 5 / 105)
+        for i in range(105, 112):
+            windowed.insert(i, data[i], timestamp=i)
+        self.assertAlmostEqual(windowed.staleness, 12 / 112)
+        self.assertEqual(_row_numbers(windowed.clusters()), self._reference(data))
+        self.assertEqual(windowed.staleness, 0)
+
+    def test_expire_returns_keys(self):
+        windowed = WindowedCluster(**self.params)
+        windowed.insert("a", ["x", "y"], timestamp=1)
+        windowed.insert("b", ["x", "z"], timestamp=5)
+        self.assertEqual(windowed.expire(3), ["a"])
+        self.assertEqual(len(windowed), 1)
+        self.assertEqual(windowed.clusters(), [])
+
+    def test_tag_counts_follow_the_window(self):
+        windowed = WindowedCluster(**self.params)
+        windowed.insert("a", ["x", "y", "y"], timestamp=1)
+        windowed.insert("b", ["x", "z"], timestamp=2)
+        self.assertEqual(sorted(windowed._tag_counts.values()), [1, 2, 2])
+        windowed.expire(2)
+        self.assertEqual(sorted(windowed._vocabulary), ["x", "z"])
+        self.assertEqual(sorted(windowed._tag_counts.values()), [1, 1])
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            WindowedCluster(min_elements_in_cluster=2, min_similarity_first_iter=1.5)
+        with self.assertRaises(ValueError):
+            WindowedCluster(
+                min_elements_in_cluster=2, min_similarity_first_iter=0.5, max_staleness=-1
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()